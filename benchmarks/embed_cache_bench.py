@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the embedding cache's storage layer.
+
+Usage:
+    python benchmarks/embed_cache_bench.py [--count N] [--dim D] [--dtype float32|float16]
+                                           [--backend sqlite|mmap]
+
+Embedding calls are replaced by random vectors so only cache overhead is
+measured. Reports misses/sec (lookup + store) and hits/sec, single and
+batched, for the pickled-list table the cache used to keep and for the
+chosen backend (with the in-process L1 emptied first), then for L1 alone,
+plus how fast a whole matrix comes back for faiss.
+"""
+import argparse
+import hashlib
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from deep_crawler.indexing import embed_cache
+
+def timed(fn, items):
+    start = time.perf_counter()
+    fn(items)
+    return len(items) / (time.perf_counter() - start)
+
+def legacy(path, texts, vecs):
+    """The old get_vector: pickled lists, a commit per miss, rollback journal."""
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE IF NOT EXISTS vecs (hash TEXT PRIMARY KEY, vec BLOB)")
+    lookup = dict(zip(texts, vecs))
+
+    def get(text):
+        h = hashlib.sha256(text.encode()).hexdigest()
+        row = con.execute("SELECT vec FROM vecs WHERE hash=?", (h,)).fetchone()
+        if row:
+            return pickle.loads(row[0])
+        vec = lookup[text].tolist()
+        con.execute("INSERT OR REPLACE INTO vecs VALUES (?,?)", (h, pickle.dumps(vec)))
+        con.commit()
+        return vec
+
+    misses = timed(lambda ts: [get(t) for t in ts], texts)
+    hits = timed(lambda ts: [get(t) for t in ts], texts)
+    con.close()
+    return misses, hits
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedding cache")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--dtype", default=embed_cache.DTYPE, choices=["float32", "float16"])
+    parser.add_argument("--backend", default=embed_cache.BACKEND, choices=list(embed_cache.BACKENDS))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = [f"benchmark text {i}" for i in range(args.count)]
+    vecs = rng.standard_normal((args.count, args.dim)).astype("float32")
+    lookup = dict(zip(texts, vecs))
+    embed_cache.embed_many = lambda ts, model=None: [lookup[t] for t in ts]
+    embed_cache.DTYPE = args.dtype
+    embed_cache.BACKEND = args.backend
+    half = args.count // 2
+
+    print(f"{args.count} vectors of dim {args.dim}, stored as {args.dtype} in {args.backend}")
+    with tempfile.TemporaryDirectory() as tmp:
+        misses, hits = legacy(Path(tmp) / "legacy.sqlite", texts, vecs)
+        print(f"pickle, single  : {misses:10.1f} misses/sec  {hits:10.1f} hits/sec")
+
+        embed_cache.DB_PATH = Path(tmp) / "store.sqlite"
+        store = embed_cache.get_store()
+        def single(ts):
+            for t in ts:
+                embed_cache.get_vector(t)
+            store.flush()
+        misses = timed(single, texts[:half])
+        embed_cache.L1.clear()
+        hits = timed(lambda ts: [embed_cache.get_vector(t) for t in ts], texts[:half])
+        print(f"{args.backend:6s}, single  : {misses:10.1f} misses/sec  {hits:10.1f} hits/sec")
+        hits = timed(lambda ts: [embed_cache.get_vector(t) for t in ts], texts[:half])
+        print(f"L1    , single  : {'':10s}             {hits:10.1f} hits/sec")
+
+        def batched(ts):
+            embed_cache.get_vectors(ts)
+            store.flush()
+        misses = timed(batched, texts[half:])
+        embed_cache.L1.clear()
+        hits = timed(embed_cache.get_vectors, texts)
+        print(f"{args.backend:6s}, batched : {misses:10.1f} misses/sec  {hits:10.1f} hits/sec")
+        hits = timed(embed_cache.get_matrix, texts[half:])
+        print(f"{args.backend:6s}, matrix  : {'':10s}             {hits:10.1f} hits/sec")
+        store.close()
+
+if __name__ == "__main__":
+    main()
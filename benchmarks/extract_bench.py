@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTML extraction over a saved corpus of pages.
+
+Usage:
+    python benchmarks/extract_bench.py path/to/corpus [--workers N] [--repeat R]
+
+The corpus is any directory of *.html / *.htm files (e.g. pages saved with
+`curl -o`). Reports fast-path coverage plus pages/sec and pages/sec per core
+for the in-process readability baseline and the process-pool engine.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from deep_crawler.crawler.extractor import extract_html
+from deep_crawler.crawler.extract_engine import ExtractionEngine, fast_extract
+
+def load_corpus(path):
+    files = sorted(p for p in Path(path).rglob("*") if p.suffix in (".html", ".htm"))
+    return [(f.read_text(encoding="utf-8", errors="replace"), f.as_uri()) for f in files]
+
+def timed(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(pages)
+    return len(pages) * repeat / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction")
+    parser.add_argument("corpus", help="Directory of saved HTML pages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        parser.error(f"no .html files under {args.corpus}")
+
+    fast_hits = sum(1 for h, u in pages if fast_extract(h, u) is not None)
+    print(f"Corpus: {len(pages)} pages, fast path handles {fast_hits} ({fast_hits / len(pages):.0%})")
+
+    rate = timed(lambda ps: [extract_html(h, u) for h, u in ps], pages, args.repeat)
+    print(f"readability, in-process : {rate:8.1f} pages/sec  ({rate:8.1f} per core)")
+
+    engine = ExtractionEngine(args.workers)
+    engine.map(pages[:args.workers])  # warm the pool
+    try:
+        rate = timed(engine.map, pages, args.repeat)
+    finally:
+        engine.shutdown()
+    print(f"engine, {args.workers:2d} workers     : {rate:8.1f} pages/sec  ({rate / args.workers:8.1f} per core)")
+
+if __name__ == "__main__":
+    main()
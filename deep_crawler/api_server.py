@@ -32,10 +32,15 @@ except ImportError as e:
     print("🔄 API Server: Using Traditional CLI")
 
 from deep_crawler import reports_db
+from deep_crawler.indexing import embed_cache
+from deep_crawler.crawler import runtime as crawler_runtime
 
 # Load configuration
 CONFIG = toml.load(Path(__file__).parent.parent / "config.toml")
 
+# One crawler event loop and connection pool shared by every research run
+crawler_runtime.start()
+
 app = Flask(__name__)
 CORS(app)
 
@@ -278,6 +283,10 @@ def delete_report(research_id):
     
     return jsonify({'message': 'Report deleted successfully'})
 
+@app.route('/api/stats/embeddings', methods=['GET'])
+def embedding_stats():
+    return jsonify(embed_cache.stats())
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok', 'service': 'deep_crawler_api'})
@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 import toml
-import requests
 import hashlib
-import asyncio
 import textwrap
 from pathlib import Path
 from tqdm import tqdm
-from deep_crawler.crawler.firecrawl_async import crawl_urls
+from deep_crawler.pipeline import research_sources
 
 try:
     # Prefer enhanced planner and summariser with LangChain features
@@ -29,65 +27,39 @@ except ImportError:
 
     summarise_section = summariser.summarise_section
     ENHANCED = False
-from deep_crawler.indexing import faiss_store
 from deep_crawler.crawler.extractor import simple_extract
 from deep_crawler.llm.verifier import dangling_citations
 
 # Load config from root directory
 CFG = toml.load(Path(__file__).parent.parent / "config.toml")
 
-def searx(q, n):
-    r = requests.get(
-        CFG["search"]["searx_url"],
-        params={"q": q, "format": "json", "language": "en"},
-        timeout=15,
-    ).json()
-    return [hit["url"] for hit in r.get("results", [])[:n]]
-
 def main(question: str):
     print(f"🔍 Researching: {question}")
 
-    print("🤖 AI Planner: Analyzing question and creating research strategy...")
-    outline, kws, sections = plan_with_sections(question)
-    print(f"📋 Research Plan: {len(kws)} keywords, {len(sections)} sections")
-    print(f"🎯 Keywords: {', '.join(kws)}")
-    
-    print(f"\n📋 Research Outline:")
-    for line in outline.splitlines():
-        if line.strip() and line.startswith('#'):
-            print(f"   {line}")
-    print("")
-
-    print(f"🔍 Searching for sources...")
-    urls = []
-    for i, kw in enumerate(kws, 1):
-        print(f"   🔎 [{i}/{len(kws)}] Searching: '{kw}'")
-        new_urls = searx(kw, CFG["search"]["urls_per_keyword"])
-        urls += new_urls
-        print(f"      ➡️ Found {len(new_urls)} URLs for '{kw}'")
-    
-    urls = list(dict.fromkeys(urls))  # dedupe
-    print(f"🌐 Total unique URLs found: {len(urls)}")
-    print(f"🕷️ Starting web crawling process...\n")
+    def plan(question):
+        outline, kws, sections = plan_with_sections(question)
+        print(f"📋 Research Plan: {len(kws)} keywords, {len(sections)} sections")
+        print(f"🎯 Keywords: {', '.join(kws)}")
+        
+        print(f"\n📋 Research Outline:")
+        for line in outline.splitlines():
+            if line.strip() and line.startswith('#'):
+                print(f"   {line}")
+        print("")
+        return outline, kws, sections
 
-    # Enhanced crawling with individual URL feedback
-    print(f"📄 Crawling websites:")
-    for i, url in enumerate(urls, 1):
-        print(f"   🌐 [{i}/{len(urls)}] Crawling: {url[:80]}{'...' if len(url) > 80 else ''}")
-    
-    pages = asyncio.run(crawl_urls(urls))
+    print("🤖 AI Planner: Analyzing question and creating research strategy...")
+    print(f"🔍 Searching for sources and crawling as results arrive...")
+    outline, kws, sections, urls, pages, texts, index = research_sources(
+        question, plan, CFG["search"]["urls_per_keyword"], summarise_section
+    )
     if not pages:
         raise RuntimeError("No pages scraped.")
 
-    print(f"\n✅ Crawling complete! Successfully processed {len(pages)} pages")
+    print(f"\n🌐 Total unique URLs found: {len(urls)}")
+    print(f"✅ Crawling complete! Successfully processed {len(pages)} pages")
     print(f"❌ Failed to crawl {len(urls) - len(pages)} pages")
-    
-    # Increased text limit per page for more detailed content
-    print(f"\n🔗 Building knowledge index...")
-    texts = [p["markdown"][:8192] for p in pages]
-    print(f"   📊 Processing {len(texts)} documents...")
-    index = faiss_store.build(texts)
-    print(f"   ✅ Search index built with {len(texts)} documents")
+    print(f"🔗 Knowledge index built incrementally with {len(texts)} documents")
 
     # Create a more professional document structure
     doc = [f"# {question}", ""]
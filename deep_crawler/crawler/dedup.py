@@ -0,0 +1,100 @@
+import re
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .urls import canonical_url
+
+HOST_PREFIXES = ("www.", "m.", "amp.", "mobile.")
+AMP_PARAMS = {"amp", "outputtype", "output"}
+SHINGLE = 3
+MIN_WORDS = 50
+MAX_DISTANCE = 3        # SimHash bits that may differ for a near-duplicate
+BANDS = 4               # 4 x 16-bit bands: distance <= 3 shares at least one
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def dedup_key(url):
+    """Stricter than canonical_url: folds mirrors, AMP and mobile variants."""
+    parts = urlsplit(canonical_url(url))
+    host = parts.netloc
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = re.sub(r"/amp/?$|/index\.html?$", "", parts.path).rstrip("/") or "/"
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k.lower() not in AMP_PARAMS])
+    return urlunsplit(("", host, path, query, ""))
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE:
+        return words
+    return [" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)]
+
+def simhash(text):
+    weights = [0] * 64
+    for sh in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def _bands(h):
+    width = 64 // BANDS
+    return [(i, h >> (i * width) & ((1 << width) - 1)) for i in range(BANDS)]
+
+class Deduplicator:
+    """
+    Drops pages whose URL or content was already seen in this run; the
+    first copy is the one that gets embedded and cited.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._by_key = {}
+        self._buckets = {}
+        self.seen = 0
+        self.url_dups = 0
+        self.near_dups = 0
+
+    def _near(self, h):
+        for band in _bands(h):
+            for other, page in self._buckets.get(band, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    return page
+        return None
+
+    def add(self, page):
+        """Return True if the page is new, False if it duplicates a kept one."""
+        self.seen += 1
+        key = dedup_key(page["url"])
+        kept = self._by_key.get(key)
+        if kept is not None:
+            self.url_dups += 1
+        else:
+            body = page.get("markdown", "")
+            if len(_WORD.findall(body)) >= MIN_WORDS:
+                h = simhash(body)
+                kept = self._near(h)
+                if kept is not None:
+                    self.near_dups += 1
+                else:
+                    for band in _bands(h):
+                        self._buckets.setdefault(band, []).append((h, page))
+        if kept is not None:
+            self._by_key.setdefault(key, kept)
+            return False
+        self._by_key[key] = page
+        return True
+
+    @property
+    def dropped(self):
+        return self.url_dups + self.near_dups
+
+    @property
+    def ratio(self):
+        return self.dropped / self.seen if self.seen else 0.0
+
+    def report(self):
+        return (f"dropped {self.dropped} of {self.seen} pages ({self.ratio:.0%}): "
+                f"{self.url_dups} URL duplicates, {self.near_dups} near-duplicates")
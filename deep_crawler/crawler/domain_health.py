@@ -0,0 +1,183 @@
+import asyncio
+import sqlite3
+import time
+import threading
+from pathlib import Path
+import aiohttp
+import requests
+import toml
+from .extractor import NotHTMLError
+from .urls import host_of
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+CRAWL = CFG.get("crawler", {})
+ENABLED = CRAWL.get("health", True)
+SKIP_SCORE = CRAWL.get("health_skip", 3.0)
+DEMOTE_SCORE = CRAWL.get("health_demote", 1.0)
+COOLDOWN = CRAWL.get("health_cooldown", 21600)
+HALF_LIFE = CRAWL.get("health_half_life", 86400)
+DEMOTE_PENALTY = 100    # per score point; sinks bad hosts below every fresh hit
+
+DB_PATH = Path(__file__).parent / "domain_health.sqlite"
+
+# how much one failure of each kind counts against a domain
+WEIGHTS = {
+    "challenge": 2.0,
+    "paywall": 1.5,
+    "blocked": 1.0,
+    "timeout": 1.0,
+    "unreachable": 1.0,
+    "rate-limited": 0.5,
+    "server error": 0.5,
+    "error": 0.5,
+}
+
+# interstitials served instead of the page (not the scripts CF injects everywhere)
+CHALLENGE_MARKERS = (
+    "cf-browser-verification", "window._cf_chl_opt",
+    "<title>just a moment...</title>", "attention required! | cloudflare",
+)
+
+class ChallengeError(RuntimeError):
+    pass
+
+def looks_challenged(html):
+    head = html[:20000].lower()
+    return any(m in head for m in CHALLENGE_MARKERS)
+
+def classify(exc):
+    """Map a crawl exception to a failure kind, or None if the domain isn't at fault."""
+    if isinstance(exc, NotHTMLError):
+        return None
+    if isinstance(exc, ChallengeError):
+        return "challenge"
+    status = getattr(exc, "status", None)
+    if status is None and isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+    if status is not None:
+        headers = getattr(exc, "headers", None) or {}
+        if status == 402:
+            return "paywall"
+        if status == 429:
+            return "rate-limited"
+        if status in (401, 403, 451) or headers.get("cf-mitigated"):
+            return "challenge" if headers.get("cf-mitigated") else "blocked"
+        if status >= 500:
+            return "server error"
+        return "error"
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, requests.Timeout)):
+        return "timeout"
+    if isinstance(exc, (aiohttp.ClientConnectorError, requests.ConnectionError)):
+        return "unreachable"
+    return "error"
+
+def _decay(score, updated, now):
+    """A failure score as of `now`: it halves every HALF_LIFE seconds."""
+    return score * 0.5 ** ((now - updated) / HALF_LIFE)
+
+# Thread-local storage for SQLite connections
+_local = threading.local()
+
+def get_connection():
+    """Get a thread-local SQLite connection"""
+    if not hasattr(_local, 'connection'):
+        _local.connection = sqlite3.connect(DB_PATH)
+        _local.connection.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                score REAL NOT NULL,
+                updated REAL NOT NULL,
+                last_failure REAL,
+                reason TEXT
+            )
+        """)
+        _local.connection.commit()
+        _local.connection.create_function("decay", 3, _decay, deterministic=True)
+    return _local.connection
+
+class DomainHealth:
+    """
+    Per-domain failure scores with exponential decay.
+
+    Loaded once per crawl, updated in memory, written back with save().
+    Each host's changes are kept as score -> keep * score + added, so save()
+    applies them on top of whatever other runs wrote in the meantime.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._changes = {}      # host -> [keep, added, as of]
+        if ENABLED:
+            for host, score, updated, last_failure, reason in get_connection().execute(
+                "SELECT host, score, updated, last_failure, reason FROM hosts"
+            ):
+                self._hosts[host] = [score, updated, last_failure, reason]
+
+    def _score(self, host, now):
+        row = self._hosts.get(host)
+        if row is None:
+            return 0.0
+        return _decay(row[0], row[1], now)
+
+    def _change(self, host, now, keep, add):
+        change = self._changes.setdefault(host, [1.0, 0.0, now])
+        change[0] *= keep
+        change[1] = _decay(change[1], change[2], now) * keep + add
+        change[2] = now
+
+    def check(self, url):
+        """Return ("skip" | "demote" | None, reason, score) for a URL."""
+        if not ENABLED:
+            return None, None, 0.0
+        host = host_of(url)
+        now = time.time()
+        score = round(self._score(host, now), 2)
+        if score < DEMOTE_SCORE:
+            return None, None, score
+        _, _, last_failure, reason = self._hosts[host]
+        if score >= SKIP_SCORE and now - (last_failure or 0) < COOLDOWN:
+            return "skip", reason, score
+        # bad but cooled down (or only mildly bad): crawl it, just later
+        return "demote", reason, score
+
+    def failure(self, url, exc):
+        kind = classify(exc)
+        if kind is None or not ENABLED:
+            return
+        host = host_of(url)
+        now = time.time()
+        self._hosts[host] = [self._score(host, now) + WEIGHTS[kind], now, now, kind]
+        self._change(host, now, 1.0, WEIGHTS[kind])
+
+    def success(self, url):
+        host = host_of(url)
+        if not ENABLED or host not in self._hosts:
+            return
+        now = time.time()
+        row = self._hosts[host]
+        row[0], row[1] = self._score(host, now) / 4, now
+        self._change(host, now, 0.25, 0.0)
+
+    def save(self):
+        """Merge this run's changes into the stored scores."""
+        if not self._changes:
+            return
+        con = get_connection()
+        now = time.time()
+        with con:
+            for host, (keep, added, since) in self._changes.items():
+                _, _, last_failure, reason = self._hosts[host]
+                con.execute("""
+                    INSERT INTO hosts VALUES (:host, :added, :now, :last_failure, :reason)
+                    ON CONFLICT (host) DO UPDATE SET
+                        score = :keep * decay(score, updated, :now) + excluded.score,
+                        updated = excluded.updated,
+                        last_failure = coalesce(max(last_failure, excluded.last_failure),
+                                                last_failure, excluded.last_failure),
+                        reason = CASE WHEN excluded.last_failure >= coalesce(last_failure, 0)
+                                      THEN excluded.reason ELSE reason END
+                """, {"host": host, "added": _decay(added, since, now), "now": now,
+                      "keep": keep, "last_failure": last_failure, "reason": reason})
+                con.execute("DELETE FROM hosts WHERE host=? AND decay(score, updated, ?) < 0.05",
+                            (host, now))
+        self._changes.clear()
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import toml
+from lxml import etree, html as lxml_html
+from .extractor import extract_html
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+
+MAX_CHARS = 4000
+MIN_CHARS = 400
+
+_BOILERPLATE = (
+    "script", "style", "noscript", "template", "iframe", "svg", "form",
+    "button", "nav", "header", "footer", "aside",
+)
+_TEXT_BLOCKS = ("p", "pre", "blockquote", "li", "h2", "h3", "h4", "td")
+
+def _title(root, url):
+    t = root.find(".//title")
+    title = t.text_content().strip() if t is not None else ""
+    return " ".join(title.split()) or url
+
+def fast_extract(html, url):
+    """Cheap text-density extraction; returns None when unsure."""
+    try:
+        # html is already decoded: don't let a <meta charset> re-decode its utf-8
+        parser = lxml_html.HTMLParser(encoding="utf-8")
+        root = lxml_html.fromstring(html.encode("utf-8", "replace"), parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+    title = _title(root, url)
+    etree.strip_elements(root, *_BOILERPLATE, with_tail=False)
+
+    # credit every container with the non-link text of its paragraphs
+    scores = {}
+    for el in root.iter("p", "pre", "blockquote"):
+        text = el.text_content()
+        n = len(text.strip())
+        if n < 25:
+            continue
+        links = sum(len(a.text_content()) for a in el.iter("a"))
+        score = n * (1 - links / n) + text.count(",") * 10
+        parent = el.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + score
+        grand = parent.getparent()
+        if grand is not None:
+            scores[grand] = scores.get(grand, 0) + score / 2
+    if not scores:
+        return None
+    best = max(scores, key=scores.get)
+
+    parts = []
+    size = 0
+    for el in best.iter(*_TEXT_BLOCKS):
+        text = " ".join(el.text_content().split())
+        if len(text) < 3:
+            continue
+        parts.append(text)
+        size += len(text)
+        if size >= MAX_CHARS:
+            break
+    text = "\n\n".join(parts)
+    if len(text) < MIN_CHARS:
+        return None
+    return {
+        "url": url,
+        "title": title,
+        "markdown": f"# {title}\n\n{text[:MAX_CHARS]}",
+    }
+
+def extract(html, url):
+    """Fast path first, readability only when it gives up."""
+    return fast_extract(html, url) or extract_html(html, url)
+
+class ExtractionEngine:
+    """Runs `extract` in a process pool so parsing never holds our GIL."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # no fork: the pool starts after the crawler loop and cache
+                # writer threads, whose held locks a forked child would inherit
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+            return self._pool
+
+    def extract(self, html, url):
+        return self._executor().submit(extract, html, url).result()
+
+    async def extract_async(self, html, url):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), extract, html, url)
+
+    def map(self, items, chunksize=4):
+        """Extract many (html, url) pairs; used by the benchmark."""
+        htmls, urls = zip(*items) if items else ((), ())
+        return list(self._executor().map(extract, htmls, urls, chunksize=chunksize))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            workers = CFG.get("crawler", {}).get("extract_workers", 0)
+            _engine = ExtractionEngine(workers or None)
+        return _engine
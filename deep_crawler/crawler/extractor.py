@@ -1,7 +1,18 @@
+import codecs
 import re
+import aiohttp
 import requests
+from pathlib import Path
+import toml
+from lxml import etree
 from readability import Document
 from bs4 import BeautifulSoup
+from . import page_cache
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+MAX_BYTES = CFG.get("crawler", {}).get("max_bytes", 2_000_000)
+TEXT_BUDGET = CFG.get("crawler", {}).get("text_budget", 30_000)
+CHUNK = 16384
 
 USER_AGENT = (
     "Mozilla/5.0 (X11; Linux x86_64) "
@@ -9,10 +20,72 @@ USER_AGENT = (
     "Chrome/122.0 Safari/537.36"
 )
 
-def simple_extract(url, timeout=15):
-    resp = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout)
-    resp.raise_for_status()
-    doc = Document(resp.text)
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+BINARY_MAGIC = (
+    b"%PDF", b"PK\x03\x04", b"\x89PNG", b"GIF8", b"\xff\xd8\xff",
+    b"\x1f\x8b", b"RIFF", b"OggS", b"ID3", b"\x00\x00\x00",
+)
+TEXT_TAGS = {"p", "li", "pre", "blockquote", "td", "h1", "h2", "h3", "h4"}
+
+class NotHTMLError(ValueError):
+    pass
+
+def check_content_type(content_type):
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if ctype and ctype not in HTML_TYPES:
+        raise NotHTMLError(f"not HTML: {ctype}")
+
+def _charset(content_type, head):
+    m = re.search(r"charset=[\"']?([\w.-]+)", content_type or "", re.I)
+    m = m or re.search(rb"<meta[^>]+charset=[\"']?([\w.-]+)", head, re.I)
+    if m:
+        name = m.group(1)
+        name = name.decode("ascii", "ignore") if isinstance(name, bytes) else name
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            pass    # a made-up charset: decode as utf-8 (with replacement) instead
+    return "utf-8"
+
+class BodyCollector:
+    """
+    Accumulates a streamed response body.
+
+    The first chunk is sniffed for binary formats, the body is capped at
+    max_bytes, and an incremental lxml parse counts visible text so the
+    download can stop once there is plenty to extract from.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, text_budget=TEXT_BUDGET):
+        self.max_bytes = max_bytes
+        self.text_budget = text_budget
+        self.chunks = []
+        self.size = 0
+        self.text = 0
+        self._parser = etree.HTMLPullParser(events=("end",))
+
+    def feed(self, chunk):
+        """Add a chunk; returns False once reading further is pointless."""
+        if not self.chunks:
+            head = chunk[:1024]
+            if head.lstrip().startswith(BINARY_MAGIC) or b"\x00" in head:
+                raise NotHTMLError("binary body")
+        chunk = chunk[:self.max_bytes - self.size]
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        self._parser.feed(chunk)
+        for _, el in self._parser.read_events():
+            if isinstance(el.tag, str) and el.tag in TEXT_TAGS:
+                self.text += len("".join(el.itertext()).strip())
+        return self.size < self.max_bytes and self.text < self.text_budget
+
+    def html(self, content_type=None):
+        body = b"".join(self.chunks)
+        return body.decode(_charset(content_type, body[:2048]), errors="replace")
+
+def extract_html(html, url):
+    """Turn raw HTML into a page dict (CPU-bound, safe to run in a worker)."""
+    doc = Document(html)
     title = doc.short_title() or url
     clean_html = doc.summary()
     soup = BeautifulSoup(clean_html, "lxml")
@@ -23,5 +96,70 @@ def simple_extract(url, timeout=15):
         "markdown": f"# {title}\n\n{text[:4000]}",
     }
 
+def _get_html(url, timeout=15, headers=None):
+    """
+    The download half of simple_extract.
+
+    Returns (html, response headers); html is None on 304 Not Modified.
+    Non-HTML responses raise NotHTMLError before the body is downloaded.
+    """
+    with requests.get(
+        url,
+        headers={"User-Agent": USER_AGENT, **(headers or {})},
+        timeout=timeout,
+        stream=True,
+    ) as resp:
+        resp.raise_for_status()
+        if resp.status_code == 304:
+            return None, resp.headers
+        content_type = resp.headers.get("Content-Type")
+        check_content_type(content_type)
+        body = BodyCollector()
+        for chunk in resp.iter_content(CHUNK):
+            if not body.feed(chunk):
+                break
+        return body.html(content_type), resp.headers
+
+def simple_extract(url, timeout=15):
+    cached = page_cache.lookup(url)
+    if cached and cached["fresh"]:
+        return cached["page"]
+    html, headers = _get_html(url, timeout, page_cache.validators(cached))
+    if html is None and cached:
+        page_cache.touch(url)
+        return cached["page"]
+    if html is None:
+        # 304 with nothing cached to revalidate: a miss, so ask for the page outright
+        html, headers = _get_html(url, timeout, {"Cache-Control": "no-cache"})
+        if html is None:
+            raise ValueError(f"304 Not Modified for uncached {url}")
+    from .extract_engine import get_engine
+    page = get_engine().extract(html, url)
+    page_cache.store(url, html, page, headers)
+    return page
+
+async def fetch_html(session, url, timeout=15, headers=None):
+    """
+    Async counterpart of _get_html.
+
+    Returns (html, response headers); html is None on 304 Not Modified.
+    Non-HTML responses raise NotHTMLError before the body is downloaded.
+    """
+    async with session.get(
+        url,
+        headers={"User-Agent": USER_AGENT, **(headers or {})},
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as resp:
+        resp.raise_for_status()
+        if resp.status == 304:
+            return None, resp.headers
+        content_type = resp.headers.get("Content-Type")
+        check_content_type(content_type)
+        body = BodyCollector()
+        async for chunk in resp.content.iter_chunked(CHUNK):
+            if not body.feed(chunk):
+                break
+        return body.html(content_type), resp.headers
+
 def looks_dynamic(html):
     return bool(re.search(r"<script[^>]+src=", html, re.I))
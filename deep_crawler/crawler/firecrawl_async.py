@@ -1,55 +1,463 @@
 import asyncio
-import aiohttp
 import time
+import random
 import hashlib
-from .extractor import simple_extract, looks_dynamic
+from .extractor import fetch_html, looks_dynamic
+from .extract_engine import get_engine
+from . import page_cache, webhooks, runtime
+from .novelty import NoveltyTracker, ADAPTIVE
+from .domain_health import DomainHealth, ChallengeError, looks_challenged, DEMOTE_PENALTY
+from .runtime import client_session
+from .scheduler import HostScheduler
+from .stats import LatencyStats
+from .urls import canonical_url
 from pathlib import Path
 import toml
 import json
 
 CFG = toml.load(Path(__file__).parents[2] / "config.toml")
 FC = CFG["firecrawl"]["base_url"]
+CRAWL = CFG.get("crawler", {})
 
-async def _fc_submit(session, url, limit):
-    r = await session.post(f"{FC}/v1/crawl", json={"url": url, "limit": limit})
+POLL_INITIAL = CFG["firecrawl"].get("poll_initial", 0.25)
+POLL_MAX = CFG["firecrawl"].get("poll_max", 4.0)
+WEBHOOK_POLL_MAX = CFG["firecrawl"].get("webhook_poll_max", 15.0)
+JOB_TIMEOUT = CFG["firecrawl"].get("job_timeout", 30)
+BATCH_SIZE = CFG["firecrawl"].get("batch_size", 0)
+BATCH_LINGER = CFG["firecrawl"].get("batch_linger", 0.5)
+HEDGE = CFG["firecrawl"].get("hedge", True)
+HEDGE_DELAY = CFG["firecrawl"].get("hedge_delay", 5.0)
+HEDGE_GRACE = CFG["firecrawl"].get("hedge_grace", 2.0)
+
+# per-path latency across runs, see LATENCY.report()
+LATENCY = LatencyStats()
+_background = set()
+_refreshing = set()
+
+async def _fc_submit(session, url, limit, hooks=None):
+    body = {"url": url, "limit": limit}
+    if hooks is not None:
+        body["webhook"] = hooks.payload()
+    r = await session.post(f"{FC}/v1/crawl", json=body)
     js = await r.json()
     return js["id"]
 
-async def _fc_poll(session, jid, timeout=30):
-    start = time.time()
-    while time.time() - start < timeout:
-        r = await session.get(f"{FC}/v1/crawl/{jid}")
+async def _fc_poll(session, jid, timeout=None, hooks=None, kind="crawl", novelty=None):
+    """
+    Poll a crawl (or batch/scrape) job with exponential backoff and jitter.
+
+    With a webhook listener the backoff starts at poll_max and grows to
+    webhook_poll_max: the completion callback wakes the poller early, so
+    polls are only a safety net. With a SeedNovelty the partial pages of
+    each poll are scored, and polling stops early (returning the pages so
+    far) once the seed no longer adds anything new.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or JOB_TIMEOUT)
+    done = hooks.expect(jid) if hooks is not None else None
+    if done is not None and novelty is None:
+        delay, cap = POLL_MAX, WEBHOOK_POLL_MAX
+    else:
+        delay, cap = POLL_INITIAL, POLL_MAX
+    try:
+        while True:
+            r = await session.get(f"{FC}/v1/{kind}/{jid}")
+            js = await r.json()
+            if js["status"] == "completed":
+                if kind != "crawl":
+                    return await _fc_collect(session, js)
+                if novelty is not None:
+                    novelty.feed(js["pages"])
+                return js["pages"]
+            if js["status"] == "failed":
+                raise RuntimeError("Firecrawl job failed")
+            partial = js.get("pages") or []
+            if novelty is not None and novelty.feed(partial):
+                novelty.stop()
+                return partial
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TimeoutError("Firecrawl job timeout")
+            wait = min(delay / 2 + random.uniform(0, delay / 2), remaining)
+            if done is not None and not done.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(done), wait)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # callback already fired (or none): one prompt re-poll, then back off
+                done = None
+                await asyncio.sleep(wait)
+            delay = min(delay * 2, cap)
+    finally:
+        if hooks is not None:
+            hooks.forget(jid)
+
+async def _fc_collect(session, js):
+    # large batch results are paginated through "next"
+    data = list(js.get("data", []))
+    while js.get("next"):
+        r = await session.get(js["next"])
         js = await r.json()
-        if js["status"] == "completed":
-            return js["pages"]
-        if js["status"] == "failed":
-            raise RuntimeError("Firecrawl job failed")
-        await asyncio.sleep(2)
-    raise TimeoutError("Firecrawl job timeout")
-
-async def _handle_one(session, url, limit):
+        data += js.get("data", [])
+    return data
+
+async def _fc_batch(session, urls, hooks=None):
+    """Scrape many seed URLs in one batch job; returns {url: [page]}."""
+    body = {"urls": urls, "formats": ["markdown"]}
+    if hooks is not None:
+        body["webhook"] = hooks.payload()
+    r = await session.post(f"{FC}/v1/batch/scrape", json=body)
+    js = await r.json()
+    data = await _fc_poll(session, js["id"], hooks=hooks, kind="batch/scrape")
+
+    wanted = {canonical_url(u): u for u in urls}
+    found = {}
+    for item in data:
+        meta = item.get("metadata") or {}
+        src = meta.get("sourceURL") or meta.get("url") or ""
+        url = wanted.get(canonical_url(src)) if src else None
+        if url is None or not item.get("markdown"):
+            continue
+        found.setdefault(url, []).append({
+            "url": url,
+            "title": meta.get("title") or url,
+            "markdown": item["markdown"],
+        })
+    return found
+
+async def _static_extract(session, url):
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(None, page_cache.lookup, url)
+    if cached and cached["fresh"]:
+        return [cached["page"]]
+    # fetch on the shared session, parse in the extraction pool
+    html, headers = await fetch_html(session, url, headers=page_cache.validators(cached))
+    if html is None and cached:
+        await loop.run_in_executor(None, page_cache.touch, url)
+        return [cached["page"]]
+    if html is None:
+        # 304 with nothing cached to revalidate: a miss, so ask for the page outright
+        html, headers = await fetch_html(session, url, headers={"Cache-Control": "no-cache"})
+        if html is None:
+            raise ValueError(f"304 Not Modified for uncached {url}")
+    if looks_challenged(html):
+        raise ChallengeError(f"bot challenge served for {url}")
+    page = await get_engine().extract_async(html, url)
+    await loop.run_in_executor(None, page_cache.store, url, html, page, headers)
+    return [page]
+
+async def _fc_cancel(session, jid):
     try:
-        jid = await _fc_submit(session, url, limit)
-        return await _fc_poll(session, jid)
+        async with session.delete(f"{FC}/v1/crawl/{jid}"):
+            pass
     except Exception:
-        # static fallback
-        return [simple_extract(url)]
+        pass
+
+def _cancel_later(session, jid):
+    task = asyncio.ensure_future(_fc_cancel(session, jid))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+async def _firecrawl(session, url, limit, hooks=None, novelty=None):
+    jid = await _fc_submit(session, url, limit, hooks)
+    try:
+        pages = await _fc_poll(session, jid, hooks=hooks, novelty=novelty)
+    except asyncio.CancelledError:
+        # abandoned (crawl deadline or shutdown): stop the job server-side too
+        _cancel_later(session, jid)
+        raise
+    if novelty is not None and novelty.stopped:
+        # the seed ran dry: don't let Firecrawl keep crawling it
+        _cancel_later(session, jid)
+    return pages
+
+async def _refresh_crawl(url, limit):
+    """Re-crawl a stale cached seed on the runtime loop, off the critical path."""
+    try:
+        async with client_session() as s:
+            pages = await _firecrawl(s, url, limit)
+        if _acceptable(pages):
+            await asyncio.get_running_loop().run_in_executor(
+                None, page_cache.store_crawl, url, limit, pages)
+    except Exception:
+        pass
+    finally:
+        _refreshing.discard(page_cache.crawl_key(url, limit))
+
+def _refresh_later(url, limit):
+    key = page_cache.crawl_key(url, limit)
+    if key not in _refreshing:
+        _refreshing.add(key)
+        # the runtime loop outlives this crawl, so the refresh can finish after it
+        runtime.start().submit(_refresh_crawl(url, limit))
 
-async def crawl_urls(urls, limit=None, concurrency=None):
+async def _timed(path, coro, ok=None):
+    start = time.monotonic()
+    try:
+        result = await coro
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        LATENCY.record(path, time.monotonic() - start, False)
+        raise
+    LATENCY.record(path, time.monotonic() - start, (ok or _acceptable)(result))
+    return result
+
+def _acceptable(pages):
+    return bool(pages) and any(p.get("markdown") for p in pages)
+
+async def _handle_one(session, url, limit, hooks=None, novelty=None):
+    """
+    Firecrawl first; a static fetch starts in parallel after hedge_delay
+    (or as soon as Firecrawl fails). The first acceptable result wins and
+    the other attempt is cancelled, except that a static page gives
+    Firecrawl's multi-page crawl hedge_grace more seconds to finish first.
+    A cached crawl of the same seed and limit short-circuits all of it,
+    and is refreshed in the background if stale.
+    """
+    start = time.monotonic()
+    loop = asyncio.get_running_loop()
+    # SQLite read, zlib and JSON: keep them off the loop every crawl shares
+    cached = await loop.run_in_executor(None, page_cache.lookup_crawl, url, limit)
+    if cached and _acceptable(cached["pages"]):
+        if not cached["fresh"]:
+            _refresh_later(url, limit)
+        LATENCY.record("cache", time.monotonic() - start, True)
+        LATENCY.win("cache")
+        if novelty is not None:
+            novelty.observe(cached["pages"])
+        return cached["pages"]
+    seed = novelty.seed() if novelty is not None else None
+    fc = asyncio.create_task(_timed("firecrawl", _firecrawl(session, url, limit, hooks, seed)))
+    static = None
+    pending = {fc}
+    error = None
+    fallback = None     # static pages, held back for up to HEDGE_GRACE
+    try:
+        done, _ = await asyncio.wait(pending, timeout=HEDGE_DELAY if HEDGE else None)
+        while True:
+            if not done and static is None:
+                static = asyncio.create_task(_timed("static", _static_extract(session, url)))
+                pending.add(static)
+            for t in done:
+                pending.discard(t)
+                ok = t.exception() is None and _acceptable(t.result())
+                if t is fc and ok:
+                    LATENCY.win("firecrawl")
+                    # a crawl cut short by adaptive depth depends on what the other
+                    # seeds of this run found: it isn't a full `limit` crawl to reuse
+                    if seed is None or not seed.stopped:
+                        await loop.run_in_executor(
+                            None, page_cache.store_crawl, url, limit, t.result())
+                    return t.result()
+                if t is static and ok:
+                    fallback = t.result()
+                    grace_end = loop.time() + HEDGE_GRACE
+                # the static fetch speaks for the host itself; prefer its error
+                elif t.exception() is not None and (t is static or error is None):
+                    error = t.exception()
+                if static is None:
+                    # Firecrawl failed before the hedge fired: fall back now
+                    static = asyncio.create_task(_timed("static", _static_extract(session, url)))
+                    pending.add(static)
+            if fallback is not None and (fc.done() or loop.time() >= grace_end):
+                LATENCY.win("static")
+                if novelty is not None:
+                    novelty.observe(fallback)
+                return fallback
+            if not pending:
+                break
+            timeout = None if fallback is None else max(0, grace_end - loop.time())
+            done, _ = await asyncio.wait(pending, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        losers = [t for t in (fc, static) if t is not None and not t.done()]
+        for t in losers:
+            t.cancel()
+        # let a cancelled Firecrawl attempt queue its job DELETE before we return
+        await asyncio.gather(*losers, return_exceptions=True)
+    if error is not None:
+        raise error
+    return []
+
+async def _unique(urls):
+    seen = set()
+    if hasattr(urls, "__aiter__"):
+        async for u in urls:
+            if u not in seen:
+                seen.add(u)
+                yield u
+    else:
+        for u in urls:
+            if u not in seen:
+                seen.add(u)
+                yield u
+
+async def _admit(source, health, priorities, skipped):
+    """Drop URLs on hosts in cooldown, push merely unhealthy ones to the back."""
+    async for u in source:
+        verdict, reason, score = health.check(u)
+        if verdict == "skip":
+            if skipped is not None:
+                skipped.append((u, f"{reason}, score {score:.1f}"))
+            continue
+        if verdict == "demote":
+            priorities[u] = priorities.get(u, 0) - DEMOTE_PENALTY * score
+        yield u
+
+async def _batched(source, size, linger):
+    """Group an async stream into lists of `size`, flushing after `linger` idle seconds."""
+    it = source.__aiter__()
+    batch, nxt = [], None
+    try:
+        while True:
+            if nxt is None:
+                nxt = asyncio.ensure_future(it.__anext__())
+            try:
+                u = await asyncio.wait_for(asyncio.shield(nxt), linger if batch else None)
+            except asyncio.TimeoutError:
+                yield batch
+                batch = []
+                continue
+            except StopAsyncIteration:
+                break
+            nxt = None
+            batch.append(u)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if nxt is not None and not nxt.done():
+            nxt.cancel()
+
+async def crawl_stream(urls, limit=None, concurrency=None, deadline=None, priorities=None,
+                       skipped=None, novelty=None, clock_start=None):
+    """
+    Crawl URLs as they arrive (sync or async iterable), yield pages as they finish.
+
+    priorities maps url -> score (higher is crawled first; it may be filled
+    in while the URL stream is still producing). After `deadline` seconds
+    unfinished URLs are cancelled and the stream ends with what is done;
+    with a clock_start awaitable, those seconds count from when it resolves
+    (e.g. once the planner's keywords are known), not from now.
+    URLs on hosts that keep failing are skipped; (url, reason) pairs are
+    appended to `skipped` if given. In adaptive_depth mode (or with an
+    explicit NoveltyTracker) each seed's crawl stops once its pages stop
+    adding new text to what was already collected.
+    """
     limit = limit or CFG["firecrawl"]["limit_per_url"]
     concurrency = concurrency or CFG["firecrawl"]["concurrency"]
-    sem = asyncio.Semaphore(concurrency)
-    pages = []
+    if deadline is None:
+        deadline = CRAWL.get("deadline") or None
+    priorities = priorities if priorities is not None else {}
+    scheduler = HostScheduler(concurrency)
+    loop = asyncio.get_running_loop()
+    # loading and saving domain health is SQLite work: keep it off the shared loop
+    health = await loop.run_in_executor(None, DomainHealth)
+    if novelty is None and ADAPTIVE:
+        novelty = NoveltyTracker()
+    results = asyncio.Queue()
+    workers = []
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(30)) as s:
+    async with client_session() as s, webhooks.listening() as hooks:
         async def worker(u):
-            async with sem:
+            async with scheduler.slot(u, priorities.get(u, 0)):
                 try:
-                    return await _handle_one(s, u, limit)
+                    pages = await _handle_one(s, u, limit, hooks, novelty)
+                    health.success(u)
+                except Exception as e:
+                    health.failure(u, e)
+                    pages = []
+            await results.put(pages)
+
+        async def fallback(u):
+            async with scheduler.slot(u, priorities.get(u, 0)):
+                try:
+                    pages = await _timed("static", _static_extract(s, u))
+                    health.success(u)
+                    if novelty is not None:
+                        novelty.observe(pages)
+                except Exception as e:
+                    health.failure(u, e)
+                    pages = []
+            await results.put(pages)
+
+        async def batch_worker(batch):
+            async with scheduler.batch_slot(max(priorities.get(u, 0) for u in batch)):
+                try:
+                    found = await _timed("batch", _fc_batch(s, batch, hooks), ok=bool)
                 except Exception:
-                    return []
+                    found = {}
+            for u in batch:
+                if u in found:
+                    health.success(u)
+                    if novelty is not None:
+                        novelty.observe(found[u])
+                    await results.put(found[u])
+            # anything the batch job missed goes down the static path
+            await asyncio.gather(*(fallback(u) for u in batch if u not in found))
 
-        tasks = [worker(u) for u in urls]
-        for coro in asyncio.as_completed(tasks):
-            pages += await coro
-    return pages
+        async def feed():
+            source = _admit(_unique(urls), health, priorities, skipped)
+            try:
+                if BATCH_SIZE > 1:
+                    async for batch in _batched(source, BATCH_SIZE, BATCH_LINGER):
+                        workers.append(asyncio.create_task(batch_worker(batch)))
+                else:
+                    async for u in source:
+                        workers.append(asyncio.create_task(worker(u)))
+            finally:
+                await asyncio.gather(*workers, return_exceptions=True)
+                await results.put(None)
+
+        end = started = getter = None
+        if deadline and clock_start is not None:
+            started = asyncio.ensure_future(clock_start)
+        elif deadline:
+            end = loop.time() + deadline
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                if started is not None and started.done():
+                    end, started = loop.time() + deadline, None
+                remaining = None if end is None else max(0, end - loop.time())
+                getter = getter or asyncio.ensure_future(results.get())
+                waiting = {getter} if started is None else {getter, started}
+                done, _ = await asyncio.wait(waiting, timeout=remaining,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    if end is None or loop.time() < end:
+                        continue    # the clock just started
+                    late = sum(not t.done() for t in workers)
+                    print(f"   ⏰ Crawl deadline reached: cancelling {late} unfinished URLs")
+                    # keep whatever finished right before the cutoff
+                    while not results.empty():
+                        for p in results.get_nowait() or []:
+                            yield p
+                    break
+                pages, getter = getter.result(), None
+                if pages is None:
+                    await feeder  # surface errors from the URL source
+                    break
+                for p in pages:
+                    yield p
+        finally:
+            if getter is not None:
+                getter.cancel()
+            feeder.cancel()
+            for t in workers:
+                t.cancel()
+            # cancelled jobs send their Firecrawl DELETEs on this session: wait
+            # for them before it closes
+            await asyncio.gather(feeder, *workers, return_exceptions=True)
+            cancels = [t for t in _background if t.get_loop() is loop]
+            await asyncio.gather(*cancels, return_exceptions=True)
+            await loop.run_in_executor(None, health.save)
+
+async def crawl_urls(urls, limit=None, concurrency=None, deadline=None, priorities=None,
+                     skipped=None, novelty=None, clock_start=None):
+    return [p async for p in crawl_stream(urls, limit, concurrency, deadline, priorities,
+                                          skipped, novelty, clock_start)]
@@ -0,0 +1,67 @@
+from pathlib import Path
+import toml
+from .dedup import _shingles
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+FIRECRAWL = CFG["firecrawl"]
+ADAPTIVE = FIRECRAWL.get("adaptive_depth", False)
+THRESHOLD = FIRECRAWL.get("novelty_threshold", 0.2)
+WINDOW = FIRECRAWL.get("novelty_window", 3)
+
+class NoveltyTracker:
+    """
+    Shingle-level novelty of pages against everything crawled this run.
+
+    A page's novelty is the fraction of its word 3-shingles not seen in any
+    earlier page; scoring a page adds its shingles to the corpus.
+    """
+
+    def __init__(self, threshold=THRESHOLD, window=WINDOW):
+        self.threshold = threshold
+        self.window = window
+        self._corpus = set()
+        self.seeds = 0
+        self.stopped = 0
+        self.pages = 0
+
+    def novelty(self, text):
+        shingles = {hash(sh) for sh in _shingles(text)}
+        self.pages += 1
+        if not shingles:
+            return 0.0
+        new = shingles - self._corpus
+        self._corpus |= new
+        return len(new) / len(shingles)
+
+    def observe(self, pages):
+        for p in pages:
+            self.novelty(p.get("markdown", ""))
+
+    def seed(self):
+        self.seeds += 1
+        return SeedNovelty(self)
+
+    def report(self):
+        return (f"stopped {self.stopped} of {self.seeds} seeds early, "
+                f"{self.pages} pages scored")
+
+class SeedNovelty:
+    """Running novelty of one seed's crawl, fed with its growing page list."""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.scores = []
+        self.stopped = False
+
+    def feed(self, pages):
+        """Score pages not seen yet; True once the seed stops adding anything new."""
+        for p in pages[len(self.scores):]:
+            self.scores.append(self.tracker.novelty(p.get("markdown", "")))
+        recent = self.scores[-self.tracker.window:]
+        return (len(recent) >= self.tracker.window
+                and sum(recent) / len(recent) < self.tracker.threshold)
+
+    def stop(self):
+        if not self.stopped:
+            self.stopped = True
+            self.tracker.stopped += 1
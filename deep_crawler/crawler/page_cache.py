@@ -0,0 +1,135 @@
+import sqlite3
+import hashlib
+import json
+import time
+import zlib
+import threading
+from pathlib import Path
+import toml
+from .urls import canonical_url
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+ENABLED = CFG.get("cache", {}).get("pages", True)
+TTL = CFG.get("cache", {}).get("page_ttl", 86400)
+CRAWLS_ENABLED = CFG.get("cache", {}).get("crawls", True)
+CRAWL_TTL = CFG.get("cache", {}).get("crawl_ttl", 604800)
+
+DB_PATH = Path(__file__).parent / "page_cache.sqlite"
+
+# Thread-local storage for SQLite connections
+_local = threading.local()
+
+def get_connection():
+    """Get a thread-local SQLite connection"""
+    if not hasattr(_local, 'connection'):
+        _local.connection = sqlite3.connect(DB_PATH)
+        _local.connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                html BLOB,
+                page TEXT NOT NULL
+            )
+        """)
+        _local.connection.execute("""
+            CREATE TABLE IF NOT EXISTS crawls (
+                key TEXT PRIMARY KEY,
+                seed TEXT NOT NULL,
+                crawl_limit INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                pages BLOB NOT NULL
+            )
+        """)
+        _local.connection.commit()
+    return _local.connection
+
+def cache_key(url):
+    return hashlib.sha256(canonical_url(url).encode()).hexdigest()
+
+def lookup(url):
+    """Return the cached entry for url (without raw HTML) or None."""
+    if not ENABLED:
+        return None
+    row = get_connection().execute(
+        "SELECT etag, last_modified, fetched_at, page FROM pages WHERE key=?",
+        (cache_key(url),),
+    ).fetchone()
+    if not row:
+        return None
+    etag, last_modified, fetched_at, page = row
+    return {
+        "etag": etag,
+        "last_modified": last_modified,
+        "fresh": time.time() - fetched_at < TTL,
+        "page": json.loads(page),
+    }
+
+def validators(entry):
+    """Conditional request headers for revalidating a stale entry."""
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def store(url, html, page, headers=None):
+    if not ENABLED:
+        return
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    con = get_connection()
+    con.execute(
+        "INSERT OR REPLACE INTO pages VALUES (?,?,?,?,?,?,?)",
+        (
+            cache_key(url), url,
+            headers.get("etag"), headers.get("last-modified"),
+            time.time(),
+            zlib.compress(html.encode("utf-8", "replace")) if html else None,
+            json.dumps(page),
+        ),
+    )
+    con.commit()
+
+def touch(url):
+    """Mark an entry fresh again after a 304 Not Modified."""
+    con = get_connection()
+    con.execute("UPDATE pages SET fetched_at=? WHERE key=?", (time.time(), cache_key(url)))
+    con.commit()
+
+def raw_html(url):
+    row = get_connection().execute(
+        "SELECT html FROM pages WHERE key=?", (cache_key(url),)
+    ).fetchone()
+    return zlib.decompress(row[0]).decode("utf-8") if row and row[0] else None
+
+def crawl_key(seed, limit):
+    return hashlib.sha256(f"{canonical_url(seed)} {limit}".encode()).hexdigest()
+
+def lookup_crawl(seed, limit):
+    """Return {"fresh", "pages"} for a cached Firecrawl crawl of seed, or None."""
+    if not CRAWLS_ENABLED:
+        return None
+    row = get_connection().execute(
+        "SELECT fetched_at, pages FROM crawls WHERE key=?", (crawl_key(seed, limit),)
+    ).fetchone()
+    if not row:
+        return None
+    fetched_at, pages = row
+    return {
+        "fresh": time.time() - fetched_at < CRAWL_TTL,
+        "pages": json.loads(zlib.decompress(pages)),
+    }
+
+def store_crawl(seed, limit, pages):
+    if not CRAWLS_ENABLED:
+        return
+    con = get_connection()
+    con.execute(
+        "INSERT OR REPLACE INTO crawls VALUES (?,?,?,?,?)",
+        (crawl_key(seed, limit), seed, limit, time.time(),
+         zlib.compress(json.dumps(pages).encode())),
+    )
+    con.commit()
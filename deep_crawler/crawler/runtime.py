@@ -0,0 +1,69 @@
+import asyncio
+import atexit
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+import aiohttp
+import toml
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+CRAWL = CFG.get("crawler", {})
+
+def new_session():
+    connector = aiohttp.TCPConnector(
+        limit=CRAWL.get("max_connections", 100),
+        use_dns_cache=True,
+        ttl_dns_cache=CRAWL.get("dns_ttl", 300),
+        keepalive_timeout=30,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(30))
+
+class _Runtime:
+    """Background event loop that owns one long-lived ClientSession."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="crawler-loop", daemon=True
+        )
+        self.thread.start()
+        self.session = self.submit(self._open()).result()
+
+    async def _open(self):
+        return new_session()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self):
+        try:
+            self.submit(self.session.close()).result(timeout=5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+_runtime = None
+_lock = threading.Lock()
+
+def start():
+    """Keep connections, DNS answers and keep-alives across research runs."""
+    global _runtime
+    with _lock:
+        if _runtime is None:
+            _runtime = _Runtime()
+            atexit.register(_runtime.close)
+        return _runtime
+
+def run(coro):
+    """Run a crawler coroutine on the shared loop if started, else asyncio.run."""
+    if _runtime is not None:
+        return _runtime.submit(coro).result()
+    return asyncio.run(coro)
+
+@asynccontextmanager
+async def client_session():
+    rt = _runtime
+    if rt is not None and asyncio.get_running_loop() is rt.loop:
+        yield rt.session
+    else:
+        async with new_session() as s:
+            yield s
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+import toml
+from .urls import host_of
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+CRAWL = CFG.get("crawler", {})
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class PrioritySemaphore:
+    """Semaphore whose waiters are woken highest priority first (FIFO on ties)."""
+
+    def __init__(self, value):
+        self._value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority=0):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # woken and cancelled at once: pass the slot on
+            fut.cancel()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._value += 1
+
+    @asynccontextmanager
+    async def hold(self, priority=0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+class HostScheduler:
+    """
+    Global concurrency cap plus a per-domain cap and token bucket.
+
+    A URL waits for its host first and only then takes a global slot, so a
+    burst of same-domain URLs never starves the other hosts. Both queues
+    hand out slots by priority.
+    """
+
+    def __init__(self, concurrency, per_host=None, rate=None, burst=None):
+        self.per_host = per_host or CRAWL.get("per_host", 2)
+        self.rate = rate or CRAWL.get("host_rate", 2.0)
+        self.burst = burst or CRAWL.get("host_burst", 4)
+        self._global = PrioritySemaphore(concurrency)
+        self._hosts = {}
+
+    def _host(self, url):
+        host = host_of(url)
+        if host not in self._hosts:
+            self._hosts[host] = (
+                PrioritySemaphore(self.per_host),
+                TokenBucket(self.rate, self.burst),
+            )
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url, priority=0):
+        sem, bucket = self._host(url)
+        async with sem.hold(priority):
+            await bucket.acquire()
+            async with self._global.hold(priority):
+                yield
+
+    @asynccontextmanager
+    async def batch_slot(self, priority=0):
+        """A global slot only: batch jobs hit Firecrawl, not the seed hosts."""
+        async with self._global.hold(priority):
+            yield
@@ -0,0 +1,53 @@
+import threading
+from collections import Counter, defaultdict, deque
+
+class LatencyStats:
+    """Rolling per-path latency samples, kept to tune hedge_delay."""
+
+    def __init__(self, size=500):
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+        self._failures = Counter()
+        self._wins = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds, ok):
+        with self._lock:
+            if ok:
+                self._samples[path].append(seconds)
+            else:
+                self._failures[path] += 1
+
+    def win(self, path):
+        with self._lock:
+            self._wins[path] += 1
+
+    @staticmethod
+    def _pct(values, q):
+        return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+    def summary(self):
+        with self._lock:
+            paths = set(self._samples) | set(self._failures) | set(self._wins)
+            out = {}
+            for path in sorted(paths):
+                values = sorted(self._samples[path])
+                out[path] = {
+                    "ok": len(values),
+                    "failed": self._failures[path],
+                    "wins": self._wins[path],
+                    "p50": self._pct(values, 0.5),
+                    "p90": self._pct(values, 0.9),
+                }
+            return out
+
+    def report(self):
+        parts = []
+        for path, s in self.summary().items():
+            if s["p50"] is None:
+                parts.append(f"{path}: {s['failed']} failed")
+            else:
+                parts.append(
+                    f"{path}: p50 {s['p50']:.1f}s p90 {s['p90']:.1f}s, "
+                    f"{s['wins']} wins, {s['failed']} failed"
+                )
+        return "; ".join(parts)
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+import toml
+from aiohttp import web
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+FIRECRAWL = CFG["firecrawl"]
+PORT = FIRECRAWL.get("webhook_port", 0)
+HOST = FIRECRAWL.get("webhook_host", "127.0.0.1")
+PUBLIC_URL = FIRECRAWL.get("webhook_url", "")
+WILDCARDS = ("", "0.0.0.0", "::")
+EARLY_TTL = 60          # seconds to hold a callback that beat expect() for its job
+EARLY_MAX = 1024        # ... and how many such callbacks at most
+
+def callback_url(host, port):
+    """URL Firecrawl calls for a listener bound to host:port."""
+    if host in WILDCARDS:
+        raise ValueError(f"webhook_host {host!r} doesn't say where Firecrawl can reach us; "
+                         "set [firecrawl].webhook_url")
+    if ":" in host:
+        host = f"[{host}]"
+    return f"http://{host}:{port}/firecrawl"
+
+class WebhookListener:
+    """Tiny local endpoint that Firecrawl calls when a job finishes."""
+
+    def __init__(self, host=None, port=None, url=None):
+        self.host = HOST if host is None else host
+        self.port = PORT if port is None else port
+        self.url = PUBLIC_URL if url is None else url     # "" = derive from the bound address
+        self._waiters = {}
+        self._early = {}        # jid -> (event, when) for callbacks nobody expects yet
+        self._runner = None
+
+    async def start(self):
+        if not self.url:
+            callback_url(self.host, self.port)      # fail before binding
+        app = web.Application()
+        app.router.add_post("/firecrawl", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        if not self.url:
+            self.url = callback_url(self.host, self._runner.addresses[0][1])
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def expect(self, jid):
+        """Future resolved with the event type once job `jid` finishes."""
+        if jid not in self._waiters:
+            fut = self._waiters[jid] = asyncio.get_running_loop().create_future()
+            early = self._early.pop(jid, None)
+            if early is not None:
+                fut.set_result(early[0])
+        return self._waiters[jid]
+
+    def forget(self, jid):
+        self._waiters.pop(jid, None)
+
+    def _prune(self, now):
+        while self._early:
+            jid, (_, seen) = next(iter(self._early.items()))
+            if now - seen < EARLY_TTL and len(self._early) <= EARLY_MAX:
+                break
+            del self._early[jid]
+
+    async def _handle(self, request):
+        try:
+            js = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        event = js.get("type", "")
+        jid = js.get("id")
+        if jid and event.endswith((".completed", ".failed")):
+            fut = self._waiters.get(jid)
+            if fut is not None:
+                if not fut.done():
+                    fut.set_result(event)
+            else:
+                # completion may race ahead of expect(); hold it briefly, then
+                # drop it, so callbacks for unknown ids can't pile up
+                now = time.monotonic()
+                self._early[jid] = (event, now)
+                self._prune(now)
+        return web.json_response({"ok": True})
+
+    def payload(self):
+        return {"url": self.url, "events": ["completed", "failed"]}
+
+# one listener per event loop, shared by every crawl running on it
+_listeners = {}
+
+@asynccontextmanager
+async def listening():
+    """Yield the loop's WebhookListener, or None when webhooks are disabled."""
+    if not PORT:
+        yield None
+        return
+    loop = asyncio.get_running_loop()
+    entry = _listeners.get(loop)
+    if entry is None:
+        listener = WebhookListener()
+        entry = _listeners[loop] = [listener, 0, loop.create_task(listener.start())]
+    entry[1] += 1
+    try:
+        try:
+            await entry[2]
+            listener = entry[0]
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Firecrawl webhook listener unavailable ({e}), polling only")
+            listener = None
+        yield listener
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _listeners[loop]
+            await entry[0].stop()
@@ -5,14 +5,11 @@ Provides both traditional and advanced workflow options.
 """
 
 import toml
-import requests
 import hashlib
-import asyncio
 import textwrap
 from pathlib import Path
 from tqdm import tqdm
-from deep_crawler.crawler.firecrawl_async import crawl_urls
-from deep_crawler.indexing import faiss_store
+from deep_crawler.pipeline import research_sources
 from deep_crawler.crawler.extractor import simple_extract
 from deep_crawler.llm.verifier import dangling_citations
 
@@ -35,19 +32,6 @@ except ImportError as e:
 # Load config from root directory
 CFG = toml.load(Path(__file__).parent.parent / "config.toml")
 
-def searx(q, n):
-    """Search using SearX with enhanced error handling."""
-    try:
-        r = requests.get(
-            CFG["search"]["searx_url"],
-            params={"q": q, "format": "json", "language": "en"},
-            timeout=15,
-        ).json()
-        return [hit["url"] for hit in r.get("results", [])[:n]]
-    except Exception as e:
-        print(f"⚠️ Search error for '{q}': {e}")
-        return []
-
 def enhanced_main(question: str, use_langgraph: bool = False) -> str:
     """
     Enhanced main function with LangChain integration.
@@ -95,57 +79,38 @@ def run_enhanced_traditional(question: str) -> str:
     print(f"🔍 Researching: {question}")
     
     try:
-        # Enhanced planning
-        print(f"🤖 Enhanced AI Planner: Creating strategic research plan...")
-        outline, keywords, sections = plan_with_sections(question)
-        
-        print(f"📋 Research Plan: {len(keywords)} keywords, {len(sections)} sections")
-        print(f"🎯 Strategic Keywords: {', '.join(keywords[:5])}{'...' if len(keywords) > 5 else ''}")
-        
-        # Enhanced outline display
-        print(f"\n📋 Research Outline:")
-        for line in outline.splitlines()[:8]:
-            if line.strip() and line.startswith('#'):
-                print(f"   {line}")
-        if len(outline.splitlines()) > 8:
-            print(f"   ... and more sections")
-        print("")
+        # Enhanced planning, runs while speculative searches are crawled
+        def plan(question):
+            outline, keywords, sections = plan_with_sections(question)
+            
+            print(f"📋 Research Plan: {len(keywords)} keywords, {len(sections)} sections")
+            print(f"🎯 Strategic Keywords: {', '.join(keywords[:5])}{'...' if len(keywords) > 5 else ''}")
+            
+            # Enhanced outline display
+            print(f"\n📋 Research Outline:")
+            for line in outline.splitlines()[:8]:
+                if line.strip() and line.startswith('#'):
+                    print(f"   {line}")
+            if len(outline.splitlines()) > 8:
+                print(f"   ... and more sections")
+            print("")
+            return outline, keywords, sections
 
-        # Enhanced source searching
-        print(f"🔍 Enhanced Source Discovery:")
-        urls = []
-        for i, kw in enumerate(keywords, 1):
-            print(f"   🔎 [{i}/{len(keywords)}] Searching: '{kw}'")
-            new_urls = searx(kw, CFG["search"]["urls_per_keyword"])
-            urls += new_urls
-            print(f"      ➡️ Found {len(new_urls)} URLs for '{kw}'")
-        
-        urls = list(dict.fromkeys(urls))  # dedupe
-        print(f"🌐 Total unique URLs discovered: {len(urls)}")
+        print(f"🤖 Enhanced AI Planner: Creating strategic research plan...")
 
-        # Enhanced crawling
-        print(f"🕷️ Enhanced Web Crawling:")
-        for i, url in enumerate(urls[:10], 1):  # Show first 10 URLs
-            print(f"   🌐 [{i}/{len(urls)}] {url[:80]}{'...' if len(url) > 80 else ''}")
-        
-        if len(urls) > 10:
-            print(f"   🌐 ... and {len(urls) - 10} more URLs")
-        
-        pages = asyncio.run(crawl_urls(urls))
+        # Enhanced source searching, crawling and indexing overlap
+        print(f"🔍 Enhanced Source Discovery (crawling as results arrive):")
+        outline, keywords, sections, urls, pages, texts, index = research_sources(
+            question, plan, CFG["search"]["urls_per_keyword"], summarise_section
+        )
         if not pages:
             raise RuntimeError("No pages scraped.")
 
-        print(f"\n✅ Crawling Results:")
+        print(f"\n🌐 Total unique URLs discovered: {len(urls)}")
+        print(f"✅ Crawling Results:")
         print(f"   📄 Successfully crawled: {len(pages)} pages")
         print(f"   ❌ Failed to crawl: {len(urls) - len(pages)} pages")
         print(f"   📊 Success rate: {len(pages)/len(urls)*100:.1f}%")
-        
-        # Enhanced indexing
-        print(f"\n🔗 Enhanced Knowledge Processing:")
-        texts = [p["markdown"][:8192] for p in pages]
-        print(f"   📊 Processing {len(texts)} documents...")
-        print(f"   🧠 Building semantic search index...")
-        index = faiss_store.build(texts)
         print(f"   ✅ Knowledge base built with {len(texts)} documents")
 
         # Enhanced content generation
@@ -230,34 +195,30 @@ def run_traditional_workflow(question: str) -> str:
     print(f"🔍 Researching: {question}")
     
     # Use original planner and summariser
-    outline, kws = planner.plan(question)
-    print(f"📋 Research Plan: {len(kws)} keywords, {len([l for l in outline.splitlines() if l.startswith('##')])} sections")
-    print("🔍 Keywords:", ", ".join(kws))
+    def plan(question):
+        outline, kws = planner.plan(question)
+        print(f"📋 Research Plan: {len(kws)} keywords, {len([l for l in outline.splitlines() if l.startswith('##')])} sections")
+        print("🔍 Keywords:", ", ".join(kws))
 
-    urls = []
-    for kw in kws:
-        urls += searx(kw, CFG["search"]["urls_per_keyword"])
-    urls = list(dict.fromkeys(urls))
-    print(f"🌐 Found {len(urls)} unique URLs to research")
+        sections = []
+        for line in outline.splitlines():
+            if line.startswith("## "):
+                section_title = line.strip("# ").strip()
+                sections.append(section_title)
+        return outline, kws, sections
 
-    pages = asyncio.run(crawl_urls(urls))
+    outline, kws, sections, urls, pages, texts, index = research_sources(
+        question, plan, CFG["search"]["urls_per_keyword"], summariser.summarise_section
+    )
     if not pages:
         raise RuntimeError("No pages scraped.")
 
+    print(f"🌐 Found {len(urls)} unique URLs to research")
     print(f"📄 Successfully crawled {len(pages)} pages")
-    
-    texts = [p["markdown"][:8192] for p in pages]
-    index = faiss_store.build(texts)
     print(f"🔗 Built search index with {len(texts)} documents")
 
     doc = [f"# {question}", ""]
     
-    sections = []
-    for line in outline.splitlines():
-        if line.startswith("## "):
-            section_title = line.strip("# ").strip()
-            sections.append(section_title)
-    
     print(f"✍️ Writing {len(sections)} sections...")
     
     for i, sec in enumerate(sections, 1):
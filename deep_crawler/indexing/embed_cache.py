@@ -1,35 +1,235 @@
-import sqlite3
-import pickle
+import atexit
 import hashlib
-import os
 import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from deep_crawler.llm.core import embed
+import numpy as np
+import toml
+from deep_crawler.llm.core import embed_many
+from .mmap_store import MmapStore
+from .vector_store import VectorStore, enable_incremental_vacuum
+
+CFG = toml.load(Path(__file__).parents[2] / "config.toml")
+MODEL = CFG["llm"]["embed_model"]
+BATCH_SIZE = CFG.get("embeddings", {}).get("batch_size", 32)
+CONCURRENCY = CFG.get("embeddings", {}).get("concurrency", 4)
+DTYPE = CFG.get("embeddings", {}).get("dtype", "float32")
+BACKEND = CFG.get("embeddings", {}).get("backend", "sqlite")
+BACKENDS = {"sqlite": VectorStore, "mmap": MmapStore}
+REEMBED = CFG.get("embeddings", {}).get("reembed", True)
+REEMBED_LIMIT = CFG.get("embeddings", {}).get("reembed_limit", 5000)
+MAX_ENTRIES = CFG.get("embeddings", {}).get("max_entries", 0)
+MAX_MB = CFG.get("embeddings", {}).get("max_mb", 0)
+L1_MB = CFG.get("embeddings", {}).get("l1_mb", 64)
 
 DB_PATH = Path(__file__).parent / "embeddings.sqlite"
 
-# Thread-local storage for SQLite connections
-_local = threading.local()
+class L1Cache:
+    """
+    In-process LRU of float32 vectors keyed by (model, text hash), held to
+    a byte budget. Sits in front of the persistent store so repeated
+    section-title and query embeddings never leave memory.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._vecs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, model, hashes):
+        found = {}
+        with self._lock:
+            for h in dict.fromkeys(hashes):
+                vec = self._vecs.get((model, h))
+                if vec is None:
+                    self.misses += 1
+                else:
+                    self._vecs.move_to_end((model, h))
+                    found[h] = vec
+                    self.hits += 1
+        return found
+
+    def put_many(self, model, vecs):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            for h, vec in vecs.items():
+                vec = np.asarray(vec, dtype=np.float32)
+                if vec.base is not None and not isinstance(vec.base, bytes):
+                    vec = vec.copy()    # don't pin a view of the store's mapping
+                vec.setflags(write=False)
+                old = self._vecs.pop((model, h), None)
+                if old is not None:
+                    self.bytes -= old.nbytes
+                self._vecs[(model, h)] = vec
+                self.bytes += vec.nbytes
+            while self.bytes > self.max_bytes and self._vecs:
+                self.bytes -= self._vecs.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._vecs.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._vecs)
+
+L1 = L1Cache(int(L1_MB * 2**20))
+
+_store = None
+_store_lock = threading.Lock()
+_vacuumed = set()       # paths enable_incremental_vacuum has checked
+_vacuum_lock = threading.Lock()
+STATS = Counter()
+
+def get_store():
+    """Get the process-wide vector store, reopening it if DB_PATH or BACKEND changed"""
+    global _store
+    path = Path(DB_PATH)
+    if path not in _vacuumed:
+        # a one-off migration that can take minutes: keep it out of _store_lock,
+        # so callers of an already open store aren't held up by it
+        with _vacuum_lock:
+            if path not in _vacuumed:
+                enable_incremental_vacuum(path)
+                _vacuumed.add(path)
+    with _store_lock:
+        if (_store is None or _store.path != Path(DB_PATH)
+                or type(_store) is not BACKENDS[BACKEND]):
+            if _store is not None:
+                _store.close()
+            L1.clear()
+            _store = BACKENDS[BACKEND](DB_PATH, DTYPE, legacy_model=MODEL,
+                                       max_entries=MAX_ENTRIES, max_bytes=int(MAX_MB * 2**20))
+            atexit.register(_store.close)
+            if _store.migrated:
+                print(f"🔁 Embedding cache: migrated {_store.migrated} vectors for {MODEL}, "
+                      f"used once its first embedding confirms their dimension")
+            if REEMBED and any(m != MODEL for m in _store.models()):
+                threading.Thread(target=_reembed_quietly, args=(_store,),
+                                 name="embed-cache-reembed", daemon=True).start()
+        return _store
 
-def get_connection():
-    """Get a thread-local SQLite connection"""
-    if not hasattr(_local, 'connection'):
-        _local.connection = sqlite3.connect(DB_PATH)
-        _local.connection.execute(
-            "CREATE TABLE IF NOT EXISTS vecs (hash TEXT PRIMARY KEY, vec BLOB)"
-        )
-        _local.connection.commit()
-    return _local.connection
+def text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _namespace(store, model=None):
+    """(model, dim) to look vectors up under, or None before model's first vector."""
+    model = model or MODEL
+    dim = store.dim(model)
+    return (model, dim) if dim else None
+
+def _embed(store, todo, model=None):
+    """Embed and store {hash: text} with model; returns {hash: vector}."""
+    model = model or MODEL
+    todo = list(todo.items())
+    if not todo:
+        return {}
+    batches = [todo[i:i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+    if len(batches) == 1:   # no pool for the common single-request case
+        results = [embed_many([t for _, t in todo], model)]
+    else:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            results = list(pool.map(lambda b: embed_many([t for _, t in b], model), batches))
+    new = [(h, vec) for b, vecs in zip(batches, results) for (h, _), vec in zip(b, vecs)]
+    store.put_texts(todo)
+    return store.put_many((model, len(new[0][1])), new)
 
 def get_vector(text):
-    con = get_connection()
-    h = hashlib.sha256(text.encode()).hexdigest()
-    cur = con.execute("SELECT vec FROM vecs WHERE hash=?", (h,))
-    row = cur.fetchone()
-    if row:
-        return pickle.loads(row[0])
-
-    vec, _ = embed(text)
-    con.execute("INSERT OR REPLACE INTO vecs VALUES (?,?)", (h, pickle.dumps(vec)))
-    con.commit()
-    return vec
+    return get_vectors([text])[0]
+
+def get_vectors(texts):
+    """
+    Vectors for many texts at once.
+
+    The in-process L1 answers first, then one multi-row store lookup;
+    the misses are embedded in batches of batch_size with up to
+    `concurrency` requests in flight, and handed to the store to be
+    written together.
+    """
+    store = get_store()
+    hashes = [text_hash(t) for t in texts]
+    found = L1.get_many(MODEL, hashes)
+    ns = _namespace(store)
+    if found and ns:
+        store.touch(ns, found)     # keep L1-hot vectors from aging out of the store
+    rest = [h for h in hashes if h not in found]
+    if rest:
+        stored = store.get_many(ns, rest) if ns else {}
+        todo = {h: t for h, t in zip(hashes, texts) if h not in found and h not in stored}
+        STATS.update(hits=len(stored), misses=len(todo))
+        stored.update(_embed(store, todo))
+        L1.put_many(MODEL, stored)
+        found.update(stored)
+    return [found[h] for h in hashes]
+
+def get_matrix(texts):
+    """
+    Like get_vectors, but as one (len(texts), dim) float32 matrix, read
+    from the store without going through L1. With the mmap backend, texts
+    that were embedded together come back as a read-only view of the
+    store instead of a copy.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    store = get_store()
+    hashes = [text_hash(t) for t in texts]
+    ns = _namespace(store)
+    missing = set(store.missing(ns, hashes) if ns else hashes)
+    STATS.update(hits=len(set(hashes)) - len(missing), misses=len(missing))
+    _embed(store, {h: t for h, t in zip(hashes, texts) if h in missing})
+    ns = _namespace(store)
+    m = store.matrix(ns, hashes)
+    if m is None:   # a write didn't land (e.g. the model changed dimension); build it by hand
+        m = np.stack(get_vectors(texts)).astype("float32")
+    return m
+
+def stats():
+    """
+    Lookups since start-up: L1 (in-process) hits and misses, store hits
+    and misses behind it, the overall share served without an embedding
+    call, and the sizes of both tiers.
+    """
+    served = L1.hits + STATS["hits"]
+    lookups = served + STATS["misses"]
+    return {"l1_hits": L1.hits, "l1_misses": L1.misses,
+            "l1_entries": len(L1), "l1_bytes": L1.bytes,
+            "hits": STATS["hits"], "misses": STATS["misses"],
+            "hit_rate": served / lookups if lookups else 0.0,
+            **get_store().stats()}
+
+def report():
+    s = stats()
+    return (f"{s['l1_hits']} in-memory + {s['hits']} stored hits / {s['misses']} misses "
+            f"({s['hit_rate']:.0%}), {s['entries']} vectors, {s['bytes'] / 2**20:.1f} MB, "
+            f"{s['evicted']} evicted")
+
+def reembed(store, model=None, limit=None):
+    """
+    Embed the most recently used cached texts with model (the configured
+    one by default), a few batches at a time, so switching embed_model
+    doesn't start from a cold cache. Returns how many texts were embedded.
+    """
+    model = model or MODEL
+    hot = store.recent(limit or REEMBED_LIMIT)
+    ns = _namespace(store, model)
+    todo = store.missing(ns, hot) if ns else hot
+    if not todo:
+        return 0
+    print(f"🔁 Embedding cache: re-embedding {len(todo)} recently used texts for {model}")
+    done = 0
+    step = BATCH_SIZE * CONCURRENCY
+    for i in range(0, len(todo), step):
+        done += len(_embed(store, store.texts(todo[i:i + step]), model))
+    print(f"✅ Embedding cache: {done} texts re-embedded for {model}")
+    return done
+
+def _reembed_quietly(store):
+    try:
+        reembed(store)
+    except Exception as e:
+        print(f"⚠️ Embedding cache: re-embedding stopped: {e}")
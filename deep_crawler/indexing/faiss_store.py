@@ -4,15 +4,56 @@ import hashlib
 import pickle
 import os
 from pathlib import Path
-from .embed_cache import get_vector
+from .embed_cache import get_matrix
+
+CHUNK = 4096    # rows normalized at a time when the matrix is read-only
+
+def _add(index, vecs):
+    """
+    Add L2-normalized vecs to index. normalize_L2 works in place, so a
+    read-only view of the store goes through one chunk-sized buffer
+    instead of being copied whole.
+    """
+    if vecs.flags.writeable:
+        faiss.normalize_L2(vecs)
+        index.add(vecs)
+        return
+    buf = np.empty((min(CHUNK, len(vecs)), vecs.shape[1]), dtype="float32")
+    for i in range(0, len(vecs), CHUNK):
+        part = buf[:len(vecs) - i]
+        part[:] = vecs[i:i + CHUNK]
+        faiss.normalize_L2(part)
+        index.add(part)
 
 def build(texts):
-    vecs = np.vstack([get_vector(t) for t in texts]).astype("float32")
+    vecs = get_matrix(texts)
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    _add(index, vecs)
+    return index
+
+def from_vectors(vecs):
+    vecs = np.asarray(vecs, dtype="float32")
     faiss.normalize_L2(vecs)
     index = faiss.IndexFlatIP(vecs.shape[1])
     index.add(vecs)
     return index
 
+class IndexBuilder:
+    """Grows an index batch by batch while pages are still being crawled."""
+
+    def __init__(self):
+        self.index = None
+        self.texts = []
+
+    def add(self, texts):
+        if not texts:
+            return
+        vecs = get_matrix(texts)
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(vecs.shape[1])
+        _add(self.index, vecs)
+        self.texts.extend(texts)
+
 def save(index, path):
     faiss.write_index(index, str(path))
 
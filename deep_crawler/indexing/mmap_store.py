@@ -0,0 +1,300 @@
+"""
+Append-only memory-mapped vector store.
+
+Each (model, dim) namespace is one segment: a matrix file
+(`embeddings.<model>-<dim>.vecs`: a 64-byte header, then raw little-endian
+rows) and an index file (`.idx`) listing the 32-byte sha256 digest of each
+row in the same order. The index is loaded into a dict on open; rows are
+read straight out of the mapping, so a run of rows that were appended
+together comes back as a zero-copy view that can go into faiss as is.
+Texts and model dimensions live in the SQLite catalog at the store's path;
+rows are never evicted, but the catalog's texts are held to the budget.
+
+Appends take an flock on the index file and pick up rows other processes
+added first, so several workers can share one cache directory. Files are
+only created by the first append: looking a namespace up leaves no trace.
+"""
+import fcntl
+import glob
+import hashlib
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from .vector_store import DTYPES, Catalog
+
+MAGIC = b"DCVECS01"
+HEADER = 64             # keeps rows 64-byte aligned
+DIGEST = 32
+
+def read_header(matrix_path):
+    """(dtype, dim) of a matrix file."""
+    with open(matrix_path, "rb") as f:
+        magic, dtype, dim = struct.unpack("<8s8sI", f.read(20))
+    if magic != MAGIC:
+        raise ValueError(f"{matrix_path} is not a vector file")
+    return np.dtype(dtype.rstrip(b"\0").decode()), dim
+
+class Segment:
+    """One append-only matrix file and its hash index."""
+
+    def __init__(self, matrix_path, index_path, dtype):
+        self.matrix_path = Path(matrix_path)
+        self.index_path = Path(index_path)
+        self.dtype = dtype
+        self.dim = None
+        self._rows = {}         # digest -> row
+        self._digests = []
+        self._mapped = None
+        self._lock = threading.Lock()
+        self._reload()
+
+    @contextmanager
+    def _locked(self, create=False):
+        """
+        Exclusive against other threads and other processes. Yields False
+        (holding only the thread lock) if the index doesn't exist and
+        create isn't set.
+        """
+        with self._lock:
+            try:
+                f = open(self.index_path, "ab" if create else "rb")
+            except FileNotFoundError:
+                yield False
+                return
+            with f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Pick up rows appended since the last look, if anything was ever appended."""
+        with self._locked() as exists:
+            if exists:
+                self._refresh()
+
+    def _row_bytes(self):
+        return self.dim * self.dtype.itemsize
+
+    def _refresh(self):
+        """Load index entries appended since the last look (ours or another process's)."""
+        if self.dim is None and self.matrix_path.exists():
+            self.dtype, self.dim = read_header(self.matrix_path)
+        if self.dim is None:
+            return
+        size = self.matrix_path.stat().st_size - HEADER
+        rows = min(size // self._row_bytes(), self.index_path.stat().st_size // DIGEST)
+        if rows <= len(self._digests):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(len(self._digests) * DIGEST)
+            data = f.read((rows - len(self._digests)) * DIGEST)
+        for i in range(0, len(data), DIGEST):
+            self._rows[data[i:i + DIGEST]] = len(self._digests)
+            self._digests.append(data[i:i + DIGEST])
+
+    def _matrix(self, upto):
+        """The mapped matrix, remapped if it doesn't reach row `upto` yet."""
+        if self._mapped is None or len(self._mapped) < upto:
+            self._mapped = np.memmap(self.matrix_path, dtype=self.dtype, mode="r",
+                                     offset=HEADER, shape=(len(self._digests), self.dim))
+        return self._mapped
+
+    def lookup(self, hashes):
+        """Row of each hash, -1 where it isn't stored."""
+        rows = np.array([self._rows.get(bytes.fromhex(h), -1) for h in hashes], dtype=np.int64)
+        if (rows < 0).any():
+            self._reload()
+            rows = np.array([self._rows.get(bytes.fromhex(h), -1) for h in hashes], dtype=np.int64)
+        return rows
+
+    def take(self, rows):
+        """float32 matrix of the given rows; a read-only view when they're consecutive."""
+        m = self._matrix(int(rows.max()) + 1)
+        if (np.diff(rows) == 1).all():
+            out = np.asarray(m[rows[0]:rows[-1] + 1])
+        else:
+            out = np.asarray(m[rows])
+        return out if out.dtype == np.float32 else out.astype(np.float32)
+
+    def append(self, items):
+        """Append (hash, vector) pairs that aren't stored yet."""
+        with self._locked(create=True):
+            self._refresh()
+            if self.dim is None:
+                self.dim = len(items[0][1])
+                with open(self.matrix_path, "wb") as f:
+                    f.write(struct.pack("<8s8sI", MAGIC, self.dtype.str.encode(), self.dim)
+                            .ljust(HEADER, b"\0"))
+            new = {}
+            for h, v in items:
+                if len(v) != self.dim:
+                    raise ValueError(f"vector has dim {len(v)}, segment holds dim {self.dim}")
+                d = bytes.fromhex(h)
+                if d not in self._rows:
+                    new[d] = v
+            if not new:
+                return
+            # rows first, then the index: a crash leaves unindexed rows
+            # that the next append overwrites
+            with open(self.matrix_path, "r+b") as f:
+                f.seek(HEADER + len(self._digests) * self._row_bytes())
+                f.write(np.stack(list(new.values())).astype(self.dtype).tobytes())
+                f.truncate()
+            with open(self.index_path, "r+b") as f:
+                f.seek(len(self._digests) * DIGEST)
+                f.write(b"".join(new))
+                f.truncate()
+            for d in new:
+                self._rows[d] = len(self._digests)
+                self._digests.append(d)
+
+    def flush(self):
+        for p in (self.matrix_path, self.index_path):
+            if p.exists():
+                fd = os.open(p, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def __len__(self):
+        self._reload()
+        return len(self._digests)
+
+class MmapStore(Catalog):
+    """(model, dim, hash) -> vector store with one append-only segment per namespace."""
+
+    def __init__(self, path, dtype="float32", legacy_model=None, **kwargs):
+        # segments are append-only: max_entries/max_bytes only bound the texts
+        super().__init__(path, **kwargs)
+        self.dtype = np.dtype(DTYPES[dtype])
+        self._segments = {}
+        self._segments_lock = threading.Lock()
+        self.migrated = self._migrate(legacy_model)
+
+    def _stem(self, model):
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", model).strip("-")[:40]
+        slug += "-" + hashlib.sha256(model.encode()).hexdigest()[:8]
+        return f"{self.path.stem}.{slug}-"
+
+    def _files(self, ns):
+        model, dim = ns
+        stem = self._stem(model) + str(dim)
+        return self.path.with_name(stem + ".vecs"), self.path.with_name(stem + ".idx")
+
+    def _migrate(self, legacy_model):
+        """
+        Adopt an unkeyed `embeddings.vecs`/`.idx` pair as legacy_model's
+        segment, unrecorded until the model's first live embedding confirms
+        the dimension (see Catalog.record_model).
+        """
+        old_matrix, old_index = self.path.with_suffix(".vecs"), self.path.with_suffix(".idx")
+        if not (legacy_model and old_matrix.exists() and old_index.exists()):
+            return 0
+        ns = (legacy_model, read_header(old_matrix)[1])
+        matrix_path, index_path = self._files(ns)
+        if matrix_path.exists():
+            return 0
+        os.replace(old_index, index_path)
+        os.replace(old_matrix, matrix_path)
+        return len(self._segment(ns))
+
+    def _drop_stale(self, model, dim):
+        stem = self._stem(model)
+        keep = self._files((model, dim))
+        for p in self.path.parent.glob(glob.escape(stem) + "*"):
+            if p not in keep and p.suffix in (".vecs", ".idx") and p.stem[len(stem):].isdigit():
+                with self._segments_lock:
+                    self._segments.pop((model, int(p.stem[len(stem):])), None)
+                p.unlink(missing_ok=True)
+
+    def _segment(self, ns):
+        with self._segments_lock:
+            if ns not in self._segments:
+                self._segments[ns] = Segment(*self._files(ns), self.dtype)
+            return self._segments[ns]
+
+    def missing(self, ns, hashes):
+        """The distinct hashes that are not stored under ns."""
+        hashes = list(dict.fromkeys(hashes))
+        return [h for h, r in zip(hashes, self._segment(ns).lookup(hashes)) if r < 0]
+
+    def matrix(self, ns, hashes):
+        """
+        (len(hashes), dim) float32 matrix of stored vectors, or None if any
+        is missing. Consecutive rows come back as a read-only view of the map.
+        """
+        segment = self._segment(ns)
+        rows = segment.lookup(hashes)
+        if not len(rows) or (rows < 0).any():
+            return None
+        self.touch(ns, hashes)
+        return segment.take(rows)
+
+    def get_many(self, ns, hashes):
+        """{hash: float32 vector} for the hashes stored under ns = (model, dim)."""
+        segment = self._segment(ns)
+        rows = segment.lookup(hashes)
+        keep = rows >= 0
+        if not keep.any():
+            return {}
+        m = segment.take(rows[keep])
+        found = dict(zip((h for h, k in zip(hashes, keep) if k), m))
+        self.touch(ns, found)
+        return found
+
+    def get(self, ns, h):
+        return self.get_many(ns, [h]).get(h)
+
+    def put_many(self, ns, items):
+        """
+        Append (hash, vector) pairs under ns that are not stored yet.
+        Returns {hash: vector} as it will read back from the store.
+        """
+        items = [(h, np.asarray(v, dtype=self.dtype)) for h, v in items]
+        if not items:
+            return {}
+        self._segment(ns).append(items)
+        self.record_model(*ns)
+        return {h: v.astype(np.float32) for h, v in items}
+
+    def _evict(self, con):
+        """Drop the least recently used texts when the catalog is over budget."""
+        if not (self.max_entries or self.max_bytes):
+            return
+        entries = con.execute("SELECT COUNT(*) FROM texts").fetchone()[0]
+        excess = self._excess(entries, self.used_bytes(con))
+        if not excess:
+            return
+        with con:
+            con.execute("DELETE FROM texts WHERE hash IN "
+                        "(SELECT hash FROM texts ORDER BY last_used LIMIT ?)", (excess,))
+        print(f"🧹 Embedding cache: dropped {excess} least recently used texts")
+
+    def flush(self):
+        """Commit queued texts and push appended rows to disk."""
+        super().flush()
+        for segment in list(self._segments.values()):
+            segment.flush()
+
+    def close(self):
+        with self._segments_lock:
+            for segment in self._segments.values():
+                segment._mapped = None
+        super().close()
+
+    def stats(self):
+        """Entry count and bytes on disk; rows are never evicted."""
+        files = [p for ns in self.models().items() for p in self._files(ns)]
+        return {"entries": len(self),
+                "bytes": self.used_bytes() + sum(p.stat().st_size for p in files if p.exists()),
+                "evicted": 0}
+
+    def __len__(self):
+        return sum(len(self._segment(ns)) for ns in self.models().items())
@@ -0,0 +1,38 @@
+import numpy as np
+from deep_crawler.llm.core import embed_many
+
+def _unit(vecs):
+    vecs = np.asarray(vecs, dtype="float32")
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
+
+def snippet(hit):
+    return f"{hit.get('title', '')}\n{hit.get('content', '')}".strip()
+
+def select(hits, sections, n):
+    """
+    Pick up to n search hits whose snippets best cover the section titles.
+
+    Greedy facility location: each pick maximises the gain in
+    sum(max similarity of any picked snippet to each section). Once every
+    section is covered, ties go to the hit with the highest mean
+    similarity, then to the earlier (better ranked) hit.
+    """
+    if n <= 0 or len(hits) <= n:
+        return list(hits)
+    if not sections:
+        return list(hits[:n])
+    vecs = _unit(embed_many([snippet(h) for h in hits] + list(sections)))
+    sim = np.clip(vecs[:len(hits)] @ vecs[len(hits):].T, 0, None)
+    tiebreak = sim.mean(axis=1) * 1e-3 - np.arange(len(hits)) * 1e-9
+    covered = np.zeros(len(sections), dtype="float32")
+    chosen = []
+    available = np.ones(len(hits), dtype=bool)
+    for _ in range(n):
+        gain = np.maximum(sim, covered).sum(axis=1) - covered.sum() + tiebreak
+        gain[~available] = -np.inf
+        best = int(np.argmax(gain))
+        chosen.append(best)
+        available[best] = False
+        covered = np.maximum(covered, sim[best])
+    return [hits[i] for i in chosen]
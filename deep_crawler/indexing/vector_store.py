@@ -0,0 +1,471 @@
+"""
+SQLite storage for embedding vectors.
+
+Vectors are keyed by (model, dim, text hash), so changing the embedding
+model never mixes vectors from different models. They are kept as raw
+little-endian float32 (or float16) buffers and come back through
+np.frombuffer, with no pickling. The database runs in WAL mode: readers use
+thread-local connections, and every bulk write goes through a single
+writer thread that group-commits whatever has queued up in one transaction.
+
+The Catalog part (also used by the mmap backend) remembers the text behind
+each hash and the dimension each model produces, so a new model can
+re-embed the texts that were used most recently.
+
+The store can be held to an entry and/or byte budget. Hits update
+last-access times in batches, and when the writer finds the store over
+budget it evicts the least recently used vectors down to LOW_WATER of it
+(the mmap backend, whose segments are append-only, drops texts instead).
+Freed pages are handed back to the filesystem a few at a time through
+incremental vacuum; a database created before that was switched on needs
+one full VACUUM first (enable_incremental_vacuum).
+"""
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+import numpy as np
+
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+LOOKUP_CHUNK = 500      # stay under SQLite's bound-parameter limit
+MIGRATE_CHUNK = 1000
+TOUCH_BATCH = 512       # access times buffered before they're written
+TOUCH_INTERVAL = 30     # ... or seconds since the last write
+LOW_WATER = 0.9         # evict down to this share of the budget
+VACUUM_PAGES = 2048     # pages released per incremental vacuum step
+
+def connect(path, **kwargs):
+    con = sqlite3.connect(path, timeout=30, **kwargs)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+def enable_incremental_vacuum(path):
+    """
+    One-off migration: switch an existing database to incremental
+    auto_vacuum, which takes a full VACUUM (a rewrite of the whole file).
+    Returns True if it had to run. New databases get it on creation.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    con = connect(path)
+    try:
+        if (con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+                or not con.execute("SELECT 1 FROM sqlite_master").fetchone()):
+            return False
+        size = path.stat().st_size / 2**20
+        print(f"🧹 Embedding cache: enabling incremental vacuum on {path.name} "
+              f"(one-off VACUUM of {size:.1f} MB)")
+        start = time.monotonic()
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("VACUUM")
+        print(f"✅ Embedding cache: vacuumed {path.name} in {time.monotonic() - start:.1f}s")
+        return True
+    finally:
+        con.close()
+
+class Catalog:
+    """
+    Texts behind cached vectors, and the dimension of each model's vectors.
+    Also owns the writer thread: bulk writes are queued and group-committed.
+    """
+
+    def __init__(self, path, max_entries=0, max_bytes=0, commit_interval=0.05,
+                 max_batch=2048, maintain_interval=10):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.maintain_interval = maintain_interval
+        self._maintained = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}      # queued but not yet committed
+        self._touched = {}
+        self._touch_flushed = time.monotonic()
+        self._queue = queue.Queue()
+        con = self.connection()
+        # takes effect on a new database; older ones need enable_incremental_vacuum
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS texts (
+                hash TEXT PRIMARY KEY,
+                text BLOB NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS texts_lru ON texts (last_used);
+        """)
+        con.commit()
+        self._dims = {}
+        # opened here so a bad path fails now rather than in the writer
+        writer_con = connect(self.path, check_same_thread=False)
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(writer_con,), name="embed-cache-writer", daemon=True
+        )
+        self._writer.start()
+
+    def connection(self):
+        """Thread-local connection."""
+        if not hasattr(self._local, "connection"):
+            self._local.connection = connect(self.path)
+        return self._local.connection
+
+    def models(self):
+        """{model: dim} for every model with cached vectors."""
+        self._dims = dict(self.connection().execute("SELECT model, dim FROM models"))
+        return dict(self._dims)
+
+    def dim(self, model):
+        """Dimension of model's vectors, or None if none are cached."""
+        if model not in self._dims:
+            self.models()
+        return self._dims.get(model)
+
+    def record_model(self, model, dim):
+        """
+        Note the dimension model's vectors have now. Its vectors of any
+        other dimension (from before an upgrade, or migrated from an older
+        layout under the wrong model) can never be served, so they go.
+        """
+        if self._dims.get(model) != dim:
+            con = self.connection()
+            with con:
+                con.execute("INSERT OR REPLACE INTO models VALUES (?,?,?)",
+                            (model, dim, time.time()))
+            self._dims[model] = dim
+            self._drop_stale(model, dim)
+
+    def _drop_stale(self, model, dim):
+        """Subclasses drop model's vectors of other dimensions here."""
+
+    def put_texts(self, items):
+        """Queue the text behind each (hash, text) pair to be remembered."""
+        now = time.time()
+        self._write("INSERT OR REPLACE INTO texts VALUES (?,?,?)",
+                    [(h, zlib.compress(t.encode()), now) for h, t in items])
+
+    def _write(self, sql, rows, pending=()):
+        """
+        Queue rows for executemany(sql). pending is [(key, value)] to show
+        in self._pending until the rows are committed.
+        """
+        if not rows:
+            return
+        with self._lock:
+            self._pending.update(pending)
+        self._queue.put((sql, rows, pending))
+
+    def _write_loop(self, con):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][1]) if batch[0] else 0
+            deadline = time.monotonic() + self.commit_interval
+            # group commit: keep collecting until the interval ends or the batch is full
+            while batch[-1] is not None and size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][1]) if batch[-1] else 0
+            ops = [op for op in batch if op]
+            try:
+                if ops:
+                    with con:
+                        for sql, rows, _ in ops:
+                            con.executemany(sql, rows)
+            except sqlite3.Error as e:
+                print(f"⚠️ Embedding cache write failed: {e}")
+            finally:
+                with self._lock:
+                    for _, _, pending in ops:
+                        for key, v in pending:
+                            if self._pending.get(key) is v:
+                                del self._pending[key]
+            try:
+                self._maintain(con)
+            except sqlite3.Error as e:
+                print(f"⚠️ Embedding cache maintenance failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                con.close()
+                return
+
+    def _maintain(self, con):
+        """Writer-side housekeeping; runs at most every maintain_interval seconds."""
+        now = time.monotonic()
+        if now - self._maintained < self.maintain_interval:
+            return
+        self._maintained = now
+        self._evict(con)
+        if con.execute("PRAGMA freelist_count").fetchone()[0]:
+            con.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+
+    def touch(self, ns, hashes):
+        """Note an access; times reach the database in batches."""
+        now = time.time()
+        with self._lock:
+            for h in hashes:
+                self._touched[(*ns, h)] = now
+            if (len(self._touched) < TOUCH_BATCH
+                    and time.monotonic() - self._touch_flushed < TOUCH_INTERVAL):
+                return
+        self._flush_touches()
+
+    def _flush_touches(self):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touch_flushed = time.monotonic()
+        self._write_touches(touched)
+
+    def _write_touches(self, touched):
+        """Queue {(model, dim, hash): time} access times to be written."""
+        self._write("UPDATE texts SET last_used=max(last_used, ?) WHERE hash=?",
+                    [(t, h) for (_, _, h), t in touched.items()])
+
+    def _excess(self, entries, used):
+        """How many of `entries` to drop to get back under budget, given `used` bytes."""
+        excess = 0
+        if self.max_entries and entries > self.max_entries:
+            excess = entries - int(self.max_entries * LOW_WATER)
+        if self.max_bytes and used > self.max_bytes:
+            excess = max(excess, int(entries * (1 - LOW_WATER * self.max_bytes / used)) + 1)
+        return excess
+
+    def _evict(self, con):
+        """Subclasses drop entries here when over budget."""
+
+    def used_bytes(self, con=None):
+        con = con or self.connection()
+        pages, free, size = (con.execute(f"PRAGMA {p}").fetchone()[0]
+                             for p in ("page_count", "freelist_count", "page_size"))
+        return (pages - free) * size
+
+    def flush(self):
+        """
+        Block until everything queued so far, access times included, is
+        committed. Raises RuntimeError if the writer thread is gone.
+        """
+        self._flush_touches()
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                if not self._writer.is_alive():
+                    raise RuntimeError("embedding cache writer has stopped")
+                done.wait(0.5)
+
+    def texts(self, hashes):
+        """{hash: text} for the hashes whose text is known."""
+        con = self.connection()
+        found = {}
+        for i in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = hashes[i:i + LOOKUP_CHUNK]
+            rows = con.execute(
+                f"SELECT hash, text FROM texts WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((h, zlib.decompress(t).decode()) for h, t in rows)
+        return found
+
+    def recent(self, limit):
+        """Hashes of the `limit` most recently used texts, newest first."""
+        return [h for h, in self.connection().execute(
+            "SELECT hash FROM texts ORDER BY last_used DESC LIMIT ?", (limit,))]
+
+    def close(self):
+        if self._writer.is_alive():
+            self._flush_touches()
+            self._queue.put(None)
+            self._writer.join()
+        if hasattr(self._local, "connection"):
+            self._local.connection.close()
+            del self._local.connection
+
+class VectorStore(Catalog):
+    """(model, dim, hash) -> vector store; writes are asynchronous but immediately readable."""
+
+    def __init__(self, path, dtype="float32", legacy_model=None, **kwargs):
+        self.evicted = 0
+        super().__init__(path, **kwargs)
+        self.dtype = np.dtype(DTYPES[dtype])
+        self.migrated = self._migrate(self.connection(), legacy_model)
+
+    def _encode(self, vec):
+        return np.asarray(vec, dtype=self.dtype).tobytes()
+
+    @staticmethod
+    def _decode(dtype, blob):
+        vec = np.frombuffer(blob, dtype=dtype)
+        return vec if vec.dtype == np.float32 else vec.astype(np.float32)
+
+    def _migrate(self, con, legacy_model):
+        """
+        Bring older layouts up to date: the pickled `vecs` table and the
+        unkeyed `vectors` table. Their vectors are filed under legacy_model
+        (the configured model; without one they're dropped) but its
+        dimension isn't recorded: nothing is served from them until the
+        model's first live embedding shows the same dimension, and if it
+        doesn't, record_model drops them.
+        """
+        tables = {name for name, in con.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        columns = [c[1] for c in con.execute("PRAGMA table_info(vectors)")]
+        if columns and "model" not in columns:
+            con.execute("ALTER TABLE vectors RENAME TO vectors_unkeyed")
+            tables.add("vectors_unkeyed")
+        elif columns and "last_access" not in columns:
+            con.execute("ALTER TABLE vectors ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                last_access REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (model, dim, hash)
+            );
+            CREATE INDEX IF NOT EXISTS vectors_lru ON vectors (last_access);
+            CREATE INDEX IF NOT EXISTS vectors_hash ON vectors (hash);
+        """)
+        con.commit()
+        moved = 0
+        if "vecs" in tables:
+            last = 0
+            while legacy_model:
+                rows = con.execute(
+                    "SELECT rowid, hash, vec FROM vecs WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, MIGRATE_CHUNK),
+                ).fetchall()
+                if not rows:
+                    break
+                vecs = [(h, pickle.loads(v)) for _, h, v in rows]
+                con.executemany(
+                    "INSERT OR IGNORE INTO vectors VALUES (?,?,?,?,?,0)",
+                    [(legacy_model, len(v), h, self.dtype.str, self._encode(v)) for h, v in vecs],
+                )
+                last = rows[-1][0]
+                moved += len(rows)
+            con.execute("DROP TABLE vecs")
+        if "vectors_unkeyed" in tables:
+            if legacy_model:
+                moved += con.execute("""
+                    INSERT OR IGNORE INTO vectors
+                    SELECT ?, length(vec) / CASE dtype WHEN '<f2' THEN 2 ELSE 4 END,
+                           hash, dtype, vec, 0
+                    FROM vectors_unkeyed
+                """, (legacy_model,)).rowcount
+            con.execute("DROP TABLE vectors_unkeyed")
+        con.commit()
+        return moved
+
+    def _select(self, columns, ns, hashes):
+        con = self.connection()
+        for i in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = hashes[i:i + LOOKUP_CHUNK]
+            yield from con.execute(
+                f"SELECT {columns} FROM vectors WHERE model=? AND dim=? "
+                f"AND hash IN ({','.join('?' * len(chunk))})",
+                [*ns, *chunk],
+            )
+
+    def get_many(self, ns, hashes):
+        """{hash: float32 vector} for the hashes stored under ns = (model, dim)."""
+        found = {}
+        with self._lock:
+            for h in hashes:
+                if (*ns, h) in self._pending:
+                    found[h] = self._pending[(*ns, h)]
+        rest = [h for h in dict.fromkeys(hashes) if h not in found]
+        for h, dtype, blob in self._select("hash, dtype, vec", ns, rest):
+            found[h] = self._decode(dtype, blob)
+        self.touch(ns, found)
+        return found
+
+    def _write_touches(self, touched):
+        self._write("UPDATE vectors SET last_access=? WHERE model=? AND dim=? AND hash=?",
+                    [(t, *key) for key, t in touched.items()])
+        super()._write_touches(touched)
+
+    def missing(self, ns, hashes):
+        """The distinct hashes that are not stored under ns."""
+        with self._lock:
+            rest = [h for h in dict.fromkeys(hashes) if (*ns, h) not in self._pending]
+        have = {h for h, in self._select("hash", ns, rest)}
+        return [h for h in rest if h not in have]
+
+    def matrix(self, ns, hashes):
+        """(len(hashes), dim) float32 matrix of stored vectors, or None if any is missing."""
+        found = self.get_many(ns, hashes)
+        if not hashes or any(h not in found for h in hashes):
+            return None
+        return np.stack([found[h] for h in hashes])
+
+    def get(self, ns, h):
+        return self.get_many(ns, [h]).get(h)
+
+    def put_many(self, ns, items):
+        """
+        Queue (hash, vector) pairs under ns to be committed together by the
+        writer. Returns {hash: vector} as it will read back from the store.
+        """
+        vecs = [(h, np.asarray(v, dtype=self.dtype)) for h, v in items]
+        if vecs:
+            self.record_model(*ns)
+            now = time.time()
+            self._write("INSERT OR REPLACE INTO vectors VALUES (?,?,?,?,?,?)",
+                        [(*ns, h, self.dtype.str, v.tobytes(), now) for h, v in vecs],
+                        [((*ns, h), v.astype(np.float32)) for h, v in vecs])
+        return {h: v.astype(np.float32) for h, v in vecs}
+
+    def _drop_stale(self, model, dim):
+        self._write("DELETE FROM vectors WHERE model=? AND dim<>?", [(model, dim)])
+
+    def _evict(self, con):
+        """Drop the least recently used vectors (and their texts) when over budget."""
+        if not (self.max_entries or self.max_bytes):
+            return
+        entries = con.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        excess = self._excess(entries, self.used_bytes(con))
+        if not excess:
+            return
+        victims = con.execute(
+            "SELECT rowid, hash FROM vectors ORDER BY last_access LIMIT ?", (excess,)
+        ).fetchall()
+        hashes = list({h for _, h in victims})
+        with con:
+            con.executemany("DELETE FROM vectors WHERE rowid=?", [(r,) for r, _ in victims])
+            # keep a text while any model still has a vector for it
+            for i in range(0, len(hashes), LOOKUP_CHUNK):
+                chunk = hashes[i:i + LOOKUP_CHUNK]
+                con.execute(
+                    f"DELETE FROM texts WHERE hash IN ({','.join('?' * len(chunk))}) "
+                    "AND NOT EXISTS (SELECT 1 FROM vectors WHERE vectors.hash = texts.hash)",
+                    chunk,
+                )
+        evicted = len(victims)
+        self.evicted += evicted
+        print(f"🧹 Embedding cache: evicted {evicted} least recently used vectors")
+
+    def stats(self):
+        """Committed entry count, bytes in use and vectors evicted so far."""
+        con = self.connection()
+        return {"entries": con.execute("SELECT COUNT(*) FROM vectors").fetchone()[0],
+                "bytes": self.used_bytes(con), "evicted": self.evicted}
+
+    def __len__(self):
+        self.flush()
+        return self.connection().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Collapse near-synonymous planner keywords before they reach SearX.
+
+Keywords are embedded in one batch and grouped greedily: each keyword
+joins the first cluster whose leader it resembles closely enough, so the
+planner's own order decides which phrasing is actually searched. The
+cluster's leader gets the URL budget of all of its members.
+
+extract() is a cheap local keyphrase pass used to start searching before
+the planner has answered.
+"""
+import re
+from collections import Counter
+import numpy as np
+from pathlib import Path
+import toml
+from deep_crawler.llm.core import embed_many
+
+CFG = toml.load(Path(__file__).parent.parent / "config.toml")
+SIMILARITY = CFG["search"].get("keyword_similarity", 0.9)
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+few for from further had has have having how i if in into is it its itself just me
+more most my no nor not now of off on once only or other our out over own same
+should so some such than that the their them then there these they this those
+through to too under until up very vs versus was we were what when where which
+while who whom why will with would you your
+""".split())
+
+_TOKEN = re.compile(r"[\w'+-]+|[^\w\s]")
+
+def extract(text, k=3):
+    """
+    Top k keyphrases of text, RAKE style: runs of content words between
+    stopwords and punctuation, scored by summed word degree / frequency.
+    """
+    phrases, run = [], []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok in STOPWORDS or not tok[0].isalnum():
+            if run:
+                phrases.append(tuple(run))
+            run = []
+        else:
+            run.append(tok)
+    if run:
+        phrases.append(tuple(run))
+    freq, degree = Counter(), Counter()
+    for p in phrases:
+        for w in p:
+            freq[w] += 1
+            degree[w] += len(p)
+    scores = {p: sum(degree[w] / freq[w] for w in p) for p in phrases}
+    return [" ".join(p) for p in sorted(scores, key=lambda p: -scores[p])[:k]]
+
+def _normal(kw):
+    return " ".join(kw.lower().split())
+
+def cluster(keywords, threshold=SIMILARITY):
+    """Group keywords into clusters of near-duplicates, in planner order."""
+    clusters, by_text = [], {}
+    for kw in keywords:
+        # case and spacing variants merge without an embedding call
+        if _normal(kw) in by_text:
+            by_text[_normal(kw)].append(kw)
+        else:
+            by_text[_normal(kw)] = [kw]
+            clusters.append(by_text[_normal(kw)])
+    if threshold <= 0 or len(clusters) < 2:
+        return clusters
+    vecs = np.asarray(embed_many([c[0] for c in clusters]), dtype="float32")
+    vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    merged, leaders = [], []
+    for i, group in enumerate(clusters):
+        sims = vecs[leaders] @ vecs[i] if leaders else np.zeros(0)
+        if len(sims) and sims.max() >= threshold:
+            merged[int(sims.argmax())].extend(group)
+        else:
+            leaders.append(i)
+            merged.append(list(group))
+    return merged
+
+def allocate(keywords, n, threshold=SIMILARITY, searched=()):
+    """
+    Return (queries, budgets, clusters): one query per cluster, asking for
+    n URLs per keyword it stands for. Clusters led by an already `searched`
+    query are dropped from queries and budgets.
+    """
+    searched = list(searched)
+    clusters = cluster(searched + list(keywords), threshold)
+    done = {_normal(q) for q in searched}
+    planned = [c for c in clusters if _normal(c[0]) not in done]
+    return [c[0] for c in planned], [n * len(c) for c in planned], clusters
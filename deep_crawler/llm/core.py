@@ -1,6 +1,4 @@
 import toml
-import hashlib
-import functools
 from pathlib import Path
 from openai import OpenAI, OpenAIError
 
@@ -26,8 +24,15 @@ def chat(system, user, max_tokens=1024, model=None):
     except OpenAIError as e:
         raise RuntimeError(f"OpenAI chat error: {e}")
 
-@functools.lru_cache(maxsize=1024)
 def embed(text, model=None):
-    model = model or CFG["api"]["embed_model"]
-    r = client.embeddings.create(model=model, input=[text])
-    return r.data[0].embedding, hashlib.md5(text.encode()).hexdigest()[:8]
+    """Embed one text, uncached; indexing.embed_cache.get_vector is the cached path."""
+    return embed_many([text], model)[0]
+
+def embed_many(texts, model=None, batch=64):
+    """Embed many short texts in as few requests as possible."""
+    model = model or CFG["llm"]["embed_model"]
+    vecs = []
+    for i in range(0, len(texts), batch):
+        r = client.embeddings.create(model=model, input=list(texts[i:i + batch]))
+        vecs.extend(d.embedding for d in sorted(r.data, key=lambda d: d.index))
+    return vecs
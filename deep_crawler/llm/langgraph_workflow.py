@@ -4,7 +4,6 @@ LangGraph Research Workflow Orchestrator
 Advanced workflow management for the research process using state machines.
 """
 
-import asyncio
 import hashlib
 import numpy as np
 import faiss
@@ -16,9 +15,13 @@ from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
 from .enhanced_core import research_planner, content_synthesizer, quality_verifier
-from ..indexing import faiss_store
+from ..indexing import faiss_store, prerank
 from ..indexing.embed_cache import get_vector
+from ..crawler import runtime
+from ..crawler.dedup import Deduplicator
 from ..crawler.firecrawl_async import crawl_urls
+from .. import search
+from ..keywords import allocate as allocate_queries
 
 # Load configuration
 CONFIG = toml.load(Path(__file__).parent.parent.parent / "config.toml")
@@ -135,31 +138,44 @@ class ResearchWorkflow:
         print(f"🔍 Workflow Node: Source Searching")
         
         try:
-            import requests
-            
             urls = []
             keywords = state["keywords"]
             
+            budget = CONFIG["search"]["urls_per_keyword"]
+            
+            # Near-synonymous keywords share one query and their URL budget
+            try:
+                queries, budget, _ = allocate_queries(keywords, budget)
+                print(f"   🧩 Keyword dedup: {len(keywords)} keywords → {len(queries)} queries")
+                keywords = queries
+            except Exception as e:
+                print(f"   ⚠️ Keyword clustering failed ({e}), searching every keyword")
+            
             for i, kw in enumerate(keywords):
                 print(f"   🔎 [{i+1}/{len(keywords)}] Searching: '{kw}'")
-                
-                # Use SearX for searching
-                try:
-                    r = requests.get(
-                        CONFIG["search"]["searx_url"],
-                        params={"q": kw, "format": "json", "language": "en"},
-                        timeout=15,
-                    ).json()
-                    
-                    new_urls = [hit["url"] for hit in r.get("results", [])[:CONFIG["search"]["urls_per_keyword"]]]
-                    urls.extend(new_urls)
-                    print(f"      ➡️ Found {len(new_urls)} URLs for '{kw}'")
-                    
-                except Exception as e:
-                    print(f"      ⚠️ Search error for '{kw}': {e}")
+            
+            # All keywords are searched concurrently; failures come back empty
+            results = search.search_all(keywords, budget)
+            hits = {}
+            for kw in keywords:
+                new_urls = [hit["url"] for hit in results[kw]]
+                urls.extend(new_urls)
+                for hit in results[kw]:
+                    hits.setdefault(hit["url"], hit)
+                print(f"      ➡️ Found {len(new_urls)} URLs for '{kw}'")
             
             # Remove duplicates
             urls = list(dict.fromkeys(urls))
+            
+            # Only crawl the hits whose snippets best cover the planned sections
+            top_n = CONFIG["search"].get("crawl_top_n", 0)
+            if top_n and state.get("sections"):
+                try:
+                    chosen = prerank.select([hits[u] for u in urls], state["sections"], top_n)
+                    print(f"   🎯 Pre-ranked {len(urls)} search hits: crawling top {len(chosen)}")
+                    urls = [hit["url"] for hit in chosen]
+                except Exception as e:
+                    print(f"   ⚠️ Snippet pre-ranking failed ({e}), crawling all hits")
             state["urls"] = urls
             state["progress"] = 25.0
             
@@ -180,7 +196,7 @@ class ResearchWorkflow:
             print(f"📄 Crawling {len(urls)} websites...")
             
             # Crawl URLs asynchronously
-            pages = asyncio.run(crawl_urls(urls))
+            pages = runtime.run(crawl_urls(urls))
             
             state["crawled_pages"] = pages
             state["progress"] = 50.0
@@ -204,6 +220,12 @@ class ResearchWorkflow:
             if not pages:
                 raise RuntimeError("No pages available for indexing")
             
+            # Drop mirrors and near-duplicates; later nodes read the kept pages
+            dedup = Deduplicator()
+            pages = [p for p in pages if dedup.add(p)]
+            state["crawled_pages"] = pages
+            print(f"   🧹 Dedup: {dedup.report()}")
+            
             # Extract text content
             texts = [p["markdown"][:8192] for p in pages]
             
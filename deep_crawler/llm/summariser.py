@@ -37,6 +37,6 @@ def rank(index, texts, query, k):
 def summarise_section(title, index, texts):
     I = rank(index, texts, title, CFG["index"]["snippets_per_sec"])
     # Increased snippet length for more detailed content
-    sn = "\n".join(f"[{i+1}] {textwrap.shorten(texts[i], 500, placeholder='...')}" for i in I)
+    sn = "\n".join(f"[{i+1}] {textwrap.shorten(texts[i], 500, placeholder='...')}" for i in I if i >= 0)
     # Increased max_tokens for longer, more detailed sections
     return chat(SYS, TMPL.format(title=title, snips=sn), max_tokens=800)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Streaming source collection shared by the CLIs.
+
+Keyword searches, crawling and embedding overlap: each keyword's URLs are
+crawled as soon as its search returns, and pages are embedded into the
+index in small batches while the rest of the crawl is still running.
+Duplicate pages are dropped between the crawl and the embedder.
+
+When the planned section titles are known and [search].crawl_top_n is set,
+searches finish first and only the top-N hits whose SearX snippets best
+cover the sections are crawled.
+
+In progressive mode the SearX snippets are indexed as soon as the searches
+finish, and the first sections are drafted from them while the crawl is
+still running; the CLIs rewrite them from the full index afterwards.
+
+research_sources() runs the planner itself: while it thinks, the raw
+question and a few locally extracted keyphrases are already being searched
+and crawled, and the planned keywords' URLs join the same crawl later.
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import toml
+from deep_crawler import search
+from deep_crawler.keywords import allocate as allocate_queries, extract as extract_keyphrases
+from deep_crawler.crawler import runtime
+from deep_crawler.crawler import firecrawl_async
+from deep_crawler.crawler.firecrawl_async import crawl_stream
+from deep_crawler.crawler.dedup import Deduplicator
+from deep_crawler.crawler import novelty as crawl_novelty
+from deep_crawler.indexing import embed_cache, faiss_store, prerank
+from deep_crawler.llm.core import embed_many
+
+CFG = toml.load(Path(__file__).parent.parent / "config.toml")
+EMBED_BATCH = 8
+TEXT_LIMIT = 8192
+CRAWL_TOP_N = CFG["search"].get("crawl_top_n", 0)
+PROGRESSIVE = CFG.get("report", {}).get("progressive", False)
+DRAFT_SECTIONS = CFG.get("report", {}).get("draft_sections", 2)
+SPECULATIVE = CFG["search"].get("speculative", True)
+SPECULATIVE_PHRASES = CFG["search"].get("speculative_phrases", 2)
+
+async def keyword_urls(keywords, n, found=None, priorities=None, hits=None):
+    """
+    Yield URLs keyword by keyword, in the order the searches complete.
+
+    If given, priorities[url] is set from SearX rank first and the
+    planner's keyword order second, so top hits of every keyword are
+    crawled before anyone's long tail. hits[url] keeps the first SearX
+    hit (title and snippet) seen for each URL. n may be a list with one
+    URL budget per keyword.
+    """
+    total, seen = 0, set()
+    for i, kw in enumerate(keywords, 1):
+        print(f"   🔎 [{i}/{len(keywords)}] Searching: '{kw}'")
+    async for k, kw, results in search.search_many(keywords, n):
+        print(f"      ➡️ Found {len(results)} URLs for '{kw}'")
+        for rank, hit in enumerate(results):
+            u = hit["url"]
+            total += 1
+            seen.add(u)
+            if hits is not None:
+                hits.setdefault(u, hit)
+            if found is not None:
+                found.append(u)
+            if priorities is not None:
+                score = -(rank + k / len(keywords))
+                priorities[u] = max(score, priorities.get(u, score))
+            yield u
+    print(f"   🔁 Search overlap: {total - len(seen)} of {total} hits were duplicate URLs")
+
+async def _dedupe_keywords(keywords, n, searched=()):
+    """
+    One query per cluster of near-synonymous keywords, with the cluster's
+    URL budget; keywords close to an already searched query are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        queries, budgets, clusters = await loop.run_in_executor(
+            None, functools.partial(allocate_queries, keywords, n, searched=searched))
+    except Exception as e:
+        print(f"   ⚠️ Keyword clustering failed ({e}), searching every keyword")
+        done = set(searched)
+        return [k for k in keywords if k not in done], n
+    print(f"   🧩 Keyword dedup: {len(keywords)} keywords → {len(queries)} queries")
+    for c in clusters:
+        if len(c) > 1:
+            print(f"      ↳ '{c[0]}' also covers: {', '.join(repr(k) for k in c[1:])}")
+    return queries, budgets
+
+async def _preranked(keywords, n, priorities, sections, hits):
+    """Search everything, then keep the crawl_top_n hits covering the sections best."""
+    found = {}
+    async for _ in keyword_urls(keywords, n, priorities=priorities, hits=found):
+        pass
+    # hits already collected (speculative searches) are being crawled anyway
+    ranked = sorted((h for u, h in found.items() if u not in hits),
+                    key=lambda h: -priorities[h["url"]])
+    for u, h in found.items():
+        hits.setdefault(u, h)
+    loop = asyncio.get_running_loop()
+    try:
+        chosen = await loop.run_in_executor(None, prerank.select, ranked, sections, CRAWL_TOP_N)
+    except Exception as e:
+        print(f"   ⚠️ Snippet pre-ranking failed ({e}), crawling by search rank")
+        chosen = ranked[:CRAWL_TOP_N]
+    print(f"   🎯 Pre-ranked {len(ranked)} search hits: crawling top {len(chosen)}")
+    for i, h in enumerate(chosen):
+        priorities[h["url"]] = -i
+    return [h["url"] for h in chosen]
+
+def _draft(hits, sections, summarise, started, stop):
+    """
+    Write the first sections from search snippets alone. Gives up (without
+    printing) once `stop` is set: the full report is being written by then.
+    """
+    texts = [prerank.snippet(h) for h in hits if prerank.snippet(h)]
+    if not texts:
+        return
+    index = faiss_store.from_vectors(embed_many(texts))
+    if stop.is_set():
+        return
+    print(f"   ⚡ Snippet index ready after {time.monotonic() - started:.1f}s "
+          f"({len(texts)} snippets): drafting while the crawl runs")
+    for sec in sections[:DRAFT_SECTIONS]:
+        content = summarise(sec, index, texts)
+        if stop.is_set():
+            return
+        print(f"\n📝 Draft from search snippets: {sec}\n{content}\n"
+              f"   ⏳ Will be rewritten once the crawl finishes "
+              f"({time.monotonic() - started:.1f}s)\n")
+
+async def _merge(*sources):
+    """Interleave async iterables, yielding items as they arrive."""
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump(source):
+        try:
+            async for item in source:
+                await queue.put(item)
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.ensure_future(pump(s)) for s in sources]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+        for t in tasks:
+            t.result()  # surface errors from any source
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def _collect(planning, n, summarise=None, speculative=()):
+    urls, pages = [], []
+    builder = faiss_store.IndexBuilder()
+    loop = asyncio.get_running_loop()
+    # one embedding thread keeps index order == page order
+    embedder = ThreadPoolExecutor(max_workers=1)
+    pending, batch = [], []
+    priorities = {}
+    skipped = []
+    novelty = crawl_novelty.NoveltyTracker() if crawl_novelty.ADAPTIVE else None
+    dedup = Deduplicator()
+    hits = {}
+    drafting = []
+    # own pool, so asyncio.run() doesn't wait for a draft that was dropped
+    drafter = ThreadPoolExecutor(max_workers=1)
+    stop_drafting = threading.Event()
+    plan = {}
+    started = time.monotonic()
+
+    async def planned():
+        outline, keywords, sections = await planning
+        plan.update(outline=outline, keywords=keywords, sections=sections)
+        queries, budgets = await _dedupe_keywords(keywords, n, speculative)
+        if sections and CRAWL_TOP_N:
+            chosen = await _preranked(queries, budgets, priorities, sections, hits)
+            urls.extend(chosen)
+            for u in chosen:
+                yield u
+        else:
+            async for u in keyword_urls(queries, budgets, urls, priorities, hits):
+                yield u
+        if PROGRESSIVE and sections and summarise is not None:
+            drafting.append(loop.run_in_executor(
+                drafter, _draft, list(hits.values()), sections, summarise, started, stop_drafting))
+
+    try:
+        source = planned()
+        if speculative:
+            print(f"   🚀 Searching while the planner runs: "
+                  f"{', '.join(repr(q) for q in speculative)}")
+            source = _merge(keyword_urls(list(speculative), n, urls, priorities, hits), source)
+        # the crawl deadline runs from when the plan arrives, not from now
+        async for page in crawl_stream(source, priorities=priorities, skipped=skipped,
+                                      novelty=novelty, clock_start=planning):
+            # mirrors, AMP copies and syndicated reprints never reach the embedder;
+            # SimHash is pure Python, so keep it off the event loop
+            if not await loop.run_in_executor(None, dedup.add, page):
+                continue
+            pages.append(page)
+            title = page.get("title") or "Untitled"
+            print(f"   📄 [{len(pages)}] {title[:60]} — {page['url'][:80]}")
+            batch.append(page["markdown"][:TEXT_LIMIT])
+            if len(batch) >= EMBED_BATCH:
+                pending.append(loop.run_in_executor(embedder, builder.add, batch))
+                batch = []
+        if batch:
+            pending.append(loop.run_in_executor(embedder, builder.add, batch))
+        await asyncio.gather(*pending)
+        if not plan:
+            # the feeder stopped before reading the plan; the caller still needs it
+            outline, keywords, sections = await planning
+            plan.update(outline=outline, keywords=keywords, sections=sections)
+        # drafts are only previews: never hold the real report back for them
+        stop_drafting.set()
+        unfinished = sum(not f.done() for f in drafting)
+        if unfinished:
+            print(f"   ⏭️ Crawl finished first: dropping {unfinished} unfinished snippet drafts")
+        for f in drafting:
+            if not f.done():
+                f.cancel()
+            elif not f.cancelled() and f.exception() is not None:
+                print(f"   ⚠️ Drafting from snippets failed: {f.exception()}")
+        if skipped:
+            print(f"   🚫 Skipped {len(skipped)} URLs on unhealthy domains:")
+            for u, reason in skipped:
+                print(f"      ⛔ {u[:80]} — {reason}")
+        print(f"   ⏱️ Crawl latency: {firecrawl_async.LATENCY.report()}")
+        print(f"   🧹 Dedup: {dedup.report()}")
+        # COUNT(*) over the store, or its one-off VACUUM if nothing was embedded yet
+        cache_report = await loop.run_in_executor(None, embed_cache.report)
+        print(f"   🧮 Embedding cache: {cache_report}")
+        if novelty is not None:
+            print(f"   🧭 Adaptive depth: {novelty.report()}")
+    finally:
+        embedder.shutdown(wait=False)
+        drafter.shutdown(wait=False)
+    return plan, list(dict.fromkeys(urls)), pages, builder
+
+def speculative_queries(question):
+    """The raw question plus its top local keyphrases."""
+    queries = [question] + extract_keyphrases(question, SPECULATIVE_PHRASES)
+    return list(dict.fromkeys(q for q in queries if q.strip()))
+
+def research_sources(question, plan, n, summarise=None):
+    """
+    Plan, search, crawl and index with the planner off the critical path.
+
+    plan(question) must return (outline, keywords, sections); it runs on a
+    worker thread while speculative searches are already being crawled.
+
+    Returns:
+        tuple: (outline, keywords, sections, unique_urls, pages, texts, index)
+    """
+    async def go():
+        loop = asyncio.get_running_loop()
+        planning = loop.run_in_executor(None, plan, question)
+        speculative = speculative_queries(question) if SPECULATIVE else ()
+        return await _collect(planning, n, summarise, speculative)
+
+    p, urls, pages, builder = runtime.run(go())
+    return (p["outline"], p["keywords"], p["sections"],
+            urls, pages, builder.texts, builder.index)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+SearX search shared by every entry point.
+
+Queries run concurrently on the crawler's pooled aiohttp session, and raw
+hits are kept in a small SQLite cache keyed by (query, language, engines,
+SearX endpoint) so related research questions don't repeat the same
+searches. The cache is read and written on executor threads.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import aiohttp
+import toml
+from deep_crawler.crawler import runtime
+
+CFG = toml.load(Path(__file__).parent.parent / "config.toml")
+SEARCH = CFG["search"]
+SEARX_URL = SEARCH["searx_url"]
+LANGUAGE = SEARCH.get("language", "en")
+ENGINES = SEARCH.get("engines", "")
+TIMEOUT = SEARCH.get("timeout", 15)
+CONCURRENCY = SEARCH.get("concurrency", 8)
+CACHE_ENABLED = CFG.get("cache", {}).get("search", True)
+TTL = CFG.get("cache", {}).get("search_ttl", 86400)
+
+DB_PATH = Path(__file__).parent / "search_cache.sqlite"
+
+# Thread-local storage for SQLite connections
+_local = threading.local()
+
+def get_connection():
+    """Get a thread-local SQLite connection"""
+    if not hasattr(_local, 'connection'):
+        _local.connection = sqlite3.connect(DB_PATH)
+        _local.connection.execute("""
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                hits TEXT NOT NULL
+            )
+        """)
+        _local.connection.commit()
+    return _local.connection
+
+def cache_key(q, language, engines, url):
+    return hashlib.sha256(json.dumps([q, language, engines, url]).encode()).hexdigest()
+
+def _lookup(q, language, engines, url):
+    if not CACHE_ENABLED:
+        return None
+    row = get_connection().execute(
+        "SELECT fetched_at, hits FROM searches WHERE key=?",
+        (cache_key(q, language, engines, url),),
+    ).fetchone()
+    if not row or time.time() - row[0] >= TTL:
+        return None
+    return json.loads(row[1])
+
+def _store(q, language, engines, url, hits):
+    if not CACHE_ENABLED:
+        return
+    con = get_connection()
+    con.execute(
+        "INSERT OR REPLACE INTO searches VALUES (?,?,?,?)",
+        (cache_key(q, language, engines, url), q, time.time(), json.dumps(hits)),
+    )
+    con.commit()
+
+async def search_async(session, q, n, language=LANGUAGE, engines=ENGINES, url=SEARX_URL):
+    """Top n hits for q as [{"url", "title", "content"}]."""
+    loop = asyncio.get_running_loop()
+    hits = await loop.run_in_executor(None, _lookup, q, language, engines, url)
+    if hits is None:
+        params = {"q": q, "format": "json", "language": language}
+        if engines:
+            params["engines"] = engines
+        async with session.get(url, params=params,
+                               timeout=aiohttp.ClientTimeout(total=TIMEOUT)) as r:
+            r.raise_for_status()
+            js = await r.json(content_type=None)
+        hits = [
+            {"url": h["url"], "title": h.get("title") or "", "content": h.get("content") or ""}
+            for h in js.get("results", []) if h.get("url")
+        ]
+        await loop.run_in_executor(None, _store, q, language, engines, url, hits)
+    return hits[:n]
+
+async def search_many(queries, n, **kwargs):
+    """
+    Yield (index, query, hits) for every query as its search finishes.
+
+    n is a hit count, or a list with one count per query. At most
+    `concurrency` requests are in flight; a failed query is reported and
+    yields no hits.
+    """
+    counts = list(n) if isinstance(n, (list, tuple)) else [n] * len(queries)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    async with runtime.client_session() as s:
+        async def one(i, q, k):
+            async with sem:
+                try:
+                    return i, q, await search_async(s, q, k, **kwargs)
+                except Exception as e:
+                    print(f"      ⚠️ Search error for '{q}': {e}")
+                    return i, q, []
+
+        tasks = [asyncio.ensure_future(one(i, q, k))
+                 for i, (q, k) in enumerate(zip(queries, counts))]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for t in tasks:
+                t.cancel()
+
+def search_all(queries, n, **kwargs):
+    """Blocking: {query: hits} for every query, searched concurrently."""
+    async def gather():
+        return {q: hits async for _, q, hits in search_many(queries, n, **kwargs)}
+    return runtime.run(gather())
+
+def searx(q, n, **kwargs):
+    """Blocking single search returning just the URLs."""
+    return [h["url"] for h in search_all([q], n, **kwargs)[q]]
@@ -144,13 +144,14 @@ def plan_and_keywords(topic: str) -> Tuple[str, List[str]]:
 # 3. SearX search
 # ──────────────────────────────────────────────────────────────
 
+def searx_all(queries: List[str], n=CFG["URLS_PER_KEYWORD"]) -> Dict[str, List[str]]:
+    # concurrent + cached, shared with the package entry points
+    from deep_crawler import search
+    found = search.search_all(queries, n, url=CFG["SEARX_URL"])
+    return {q: [h["url"] for h in hits] for q, hits in found.items()}
+
 def searx(q: str, n=CFG["URLS_PER_KEYWORD"]) -> List[str]:
-    r = requests.get(CFG["SEARX_URL"],
-                     params={"q": q, "format": "json", "language": "en"},
-                     timeout=30)
-    r.raise_for_status()
-    hits = r.json().get("results", [])
-    return [h["url"] for h in hits[:n]]
+    return searx_all([q], n)[q]
 
 # ──────────────────────────────────────────────────────────────
 # 4. Firecrawl wrapper
@@ -182,8 +183,7 @@ def simple_fetch_fallback(url: str) -> List[Dict]:
     Simple fallback that fetches a URL and extracts basic text content
     """
     try:
-        import re
-        from bs4 import BeautifulSoup
+        from deep_crawler.crawler.extract_engine import get_engine
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -193,25 +193,8 @@ def simple_fetch_fallback(url: str) -> List[Dict]:
         if resp.status_code != 200:
             return []
         
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text and clean it up
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        text = '\n'.join(line for line in lines if line)
-        
-        # Create a simple page structure
-        title = soup.title.string if soup.title else url.split('/')[-1]
-        
-        return [{
-            "url": url,
-            "title": title,
-            "markdown": f"# {title}\n\n{text[:4000]}"  # Limit content length
-        }]
+        # Parsing runs in the shared extraction process pool
+        return [get_engine().extract(resp.text, url)]
         
     except Exception as e:
         print(f"Fallback failed for {url}: {e}")
@@ -294,8 +277,9 @@ def run_research(query: str) -> str:
 
     # Gather URLs
     urls = []
+    found = searx_all(kws)
     for kw in kws:
-        urls.extend(searx(kw))
+        urls.extend(found[kw])
     urls = list(dict.fromkeys(urls))    # dedupe
 
     # Crawl
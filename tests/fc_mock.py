@@ -0,0 +1,130 @@
+"""
+A local mock of Firecrawl's crawl API, and a test case that runs the
+crawler against it with its module settings patched and its SQLite files
+in a temporary directory.
+"""
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+import aiohttp
+from aiohttp import web
+from deep_crawler.crawler import domain_health, firecrawl_async, page_cache
+
+class MockFirecrawl:
+    """
+    Crawl jobs that finish after `duration` seconds (never, by default)
+    with `outcome`, calling the job's webhook then if it was given one.
+    Submitted bodies, polls and DELETEs are recorded; subclasses shape
+    the pages with partial() and result(), or override crawl_status().
+    """
+
+    def __init__(self, duration=None, outcome="completed"):
+        self.duration = duration
+        self.outcome = outcome
+        self.submits = []
+        self.started = {}
+        self.polls = 0
+        self.deleted = []
+        self.base = None
+        self._runner = None
+        self._tasks = set()
+
+    def routes(self, app):
+        app.router.add_post("/v1/crawl", self.submit)
+        app.router.add_get("/v1/crawl/{jid}", self.status)
+        app.router.add_delete("/v1/crawl/{jid}", self.delete)
+
+    async def start(self):
+        app = web.Application()
+        self.routes(app)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self.base
+
+    async def stop(self):
+        for t in list(self._tasks):
+            t.cancel()
+        await self._runner.cleanup()
+
+    @property
+    def seeds(self):
+        return [js["url"] for js in self.submits]
+
+    def seed(self, jid):
+        return self.submits[int(jid[3:]) - 1]["url"]
+
+    async def submit(self, request):
+        js = await request.json()
+        self.submits.append(js)
+        jid = f"job{len(self.submits)}"
+        self.started[jid] = time.monotonic()
+        if "webhook" in js and self.duration is not None:
+            task = asyncio.ensure_future(self._notify(js["webhook"]["url"], jid))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return web.json_response({"success": True, "id": jid})
+
+    async def _notify(self, url, jid):
+        await asyncio.sleep(self.duration)
+        async with aiohttp.ClientSession() as s:
+            await s.post(url, json={"type": f"crawl.{self.outcome}", "id": jid})
+
+    async def status(self, request):
+        self.polls += 1
+        jid = request.match_info["jid"]
+        status, pages = self.crawl_status(jid, time.monotonic() - self.started[jid])
+        return web.json_response({"status": status, "pages": pages})
+
+    def crawl_status(self, jid, elapsed):
+        if self.duration is None or elapsed < self.duration:
+            return "scraping", self.partial(jid)
+        return self.outcome, self.result(jid)
+
+    def partial(self, jid):
+        return []
+
+    def result(self, jid):
+        seed = self.seed(jid)
+        return [{"url": seed, "markdown": f"# {seed}"}]
+
+    async def delete(self, request):
+        self.deleted.append(request.match_info["jid"])
+        return web.json_response({"success": True})
+
+class CrawlerTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    firecrawl_async and page_cache run with `settings` and `cache_settings`
+    patched in, and domain health and the page cache live in a temporary
+    directory; serve() points the crawler at a MockFirecrawl.
+    """
+    settings = {}
+    cache_settings = {}
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.patch(domain_health, DB_PATH=self.tmp / "health.sqlite", _local=threading.local())
+        self.patch(page_cache, DB_PATH=self.tmp / "pages.sqlite", _local=threading.local(),
+                   **self.cache_settings)
+        self.patch(firecrawl_async, **self.settings)
+
+    def patch(self, target, **attrs):
+        """Set module attributes until the test ends."""
+        if attrs:
+            patcher = mock.patch.multiple(target, **attrs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def serve(self, mock_firecrawl):
+        self.mock = mock_firecrawl
+        self.patch(firecrawl_async, FC=await mock_firecrawl.start())
+        self.addAsyncCleanup(mock_firecrawl.stop)
+        return mock_firecrawl
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+from fc_mock import CrawlerTestCase, MockFirecrawl
+from deep_crawler.crawler import domain_health, firecrawl_async, page_cache
+
+class TestCrawlStream(CrawlerTestCase):
+    settings = {"HEDGE": False, "POLL_INITIAL": 0.02}
+    cache_settings = {"CRAWLS_ENABLED": False}
+
+    async def test_deadline_cancels_jobs_before_the_session_closes(self):
+        await self.serve(MockFirecrawl())
+        urls = [f"http://site{i}.example/" for i in range(3)]
+        start = time.monotonic()
+        pages = await firecrawl_async.crawl_urls(urls, deadline=0.3)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(pages, [])
+        # every job got its DELETE while the session was still open
+        self.assertEqual(sorted(self.mock.deleted), ["job1", "job2", "job3"])
+
+    async def test_deadline_keeps_what_finished(self):
+        await self.serve(MockFirecrawl(duration=0))
+        fast = "http://fast.example/"
+        slow = "http://slow.example/"
+        original = firecrawl_async._handle_one
+
+        async def handle(session, url, *args):
+            if url == slow:
+                await asyncio.sleep(5)
+            return await original(session, url, *args)
+
+        with mock.patch.object(firecrawl_async, "_handle_one", handle):
+            pages = await firecrawl_async.crawl_urls([slow, fast], deadline=0.3)
+        self.assertEqual([p["url"] for p in pages], [fast])
+
+    async def test_deadline_counts_from_clock_start(self):
+        await self.serve(MockFirecrawl(duration=0))
+        planning = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().call_later(0.4, planning.set_result, "http://late.example/")
+
+        async def planned():
+            yield await planning
+
+        pages = await firecrawl_async.crawl_urls(planned(), deadline=0.2, clock_start=planning)
+        # the plan took longer than the deadline, its URL is still crawled
+        self.assertEqual([p["url"] for p in pages], ["http://late.example/"])
+
+    async def test_domain_health_is_loaded_and_saved_off_the_loop(self):
+        await self.serve(MockFirecrawl(duration=0))
+        threads = []
+
+        class Health(domain_health.DomainHealth):
+            def __init__(self):
+                threads.append(threading.current_thread())
+                super().__init__()
+
+            def save(self):
+                threads.append(threading.current_thread())
+                super().save()
+
+        with mock.patch.object(firecrawl_async, "DomainHealth", Health):
+            await firecrawl_async.crawl_urls(["http://site.example/"])
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_crawl_cache_is_read_off_the_loop(self):
+        await self.serve(MockFirecrawl())
+        self.patch(page_cache, CRAWLS_ENABLED=True)
+        seed = "http://cached.example/"
+        page_cache.store_crawl(seed, 15, [{"url": seed, "markdown": "# cached " + "x" * 500}])
+        threads = []
+        lookup = page_cache.lookup_crawl
+
+        def spy(*args):
+            threads.append(threading.current_thread())
+            return lookup(*args)
+
+        with mock.patch.object(page_cache, "lookup_crawl", spy):
+            pages = await firecrawl_async.crawl_urls([seed], limit=15)
+        self.assertEqual([p["url"] for p in pages], [seed])
+        self.assertEqual(self.mock.submits, [])
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_higher_priority_urls_are_crawled_first(self):
+        await self.serve(MockFirecrawl(duration=0))
+        urls = [f"http://site{i}.example/" for i in range(4)]
+        priorities = {urls[1]: 1, urls[2]: 5, urls[3]: 3}
+        pages = await firecrawl_async.crawl_urls(urls, concurrency=1, priorities=priorities)
+        self.assertEqual(len(pages), 4)
+        # the first URL takes the free slot; the rest queue by priority
+        self.assertEqual(self.mock.seeds, [urls[0], urls[2], urls[3], urls[1]])
+
+if __name__ == '__main__':
+    unittest.main()
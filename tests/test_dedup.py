@@ -0,0 +1,46 @@
+import unittest
+from deep_crawler.crawler.dedup import Deduplicator, dedup_key, simhash
+
+ARTICLE = " ".join(
+    f"Sentence {i} explains how vector indexes trade recall for speed in practice."
+    for i in range(40)
+)
+
+def page(url, text=ARTICLE):
+    return {"url": url, "title": "t", "markdown": f"# t\n\n{text}"}
+
+class TestDedup(unittest.TestCase):
+
+    def test_dedup_key_folds_mirrors(self):
+        base = dedup_key("https://example.com/story")
+        for url in ("http://www.example.com/story/",
+                    "https://m.example.com/story?utm_source=x",
+                    "https://example.com/story/amp",
+                    "https://amp.example.com/story?amp=1#top"):
+            self.assertEqual(dedup_key(url), base, url)
+        self.assertNotEqual(dedup_key("https://example.com/other"), base)
+
+    def test_simhash_is_close_for_small_edits(self):
+        a = simhash(ARTICLE)
+        b = simhash(ARTICLE + " Posted by a syndication partner.")
+        self.assertLessEqual(bin(a ^ b).count("1"), 3)
+
+    def test_drops_url_and_near_duplicates(self):
+        d = Deduplicator()
+        first = page("https://example.com/story")
+        self.assertTrue(d.add(first))
+        self.assertFalse(d.add(page("https://www.example.com/story/")))
+        self.assertFalse(d.add(page("https://mirror.net/copy", ARTICLE + " Mirrored.")))
+        other = " ".join(f"Unrelated note {i} about gardening tomatoes in spring." for i in range(40))
+        self.assertTrue(d.add(page("https://garden.org/tomatoes", other)))
+        self.assertEqual((d.seen, d.url_dups, d.near_dups), (4, 1, 1))
+        self.assertNotIn("aliases", first)
+        self.assertAlmostEqual(d.ratio, 0.5)
+
+    def test_short_pages_are_only_deduped_by_url(self):
+        d = Deduplicator()
+        self.assertTrue(d.add(page("https://a.com/x", "short text")))
+        self.assertTrue(d.add(page("https://b.com/y", "short text")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+from deep_crawler.crawler import domain_health
+from deep_crawler.crawler.domain_health import DomainHealth, ChallengeError, classify
+from deep_crawler.crawler.extractor import NotHTMLError
+
+class HTTPStatusError(Exception):
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+class TestDomainHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.orig_path = domain_health.DB_PATH
+        domain_health.DB_PATH = Path(self.tmp.name) / "health.sqlite"
+        domain_health._local = threading.local()
+
+    def tearDown(self):
+        domain_health.get_connection().close()
+        domain_health._local = threading.local()
+        domain_health.DB_PATH = self.orig_path
+        self.tmp.cleanup()
+
+    def test_classify(self):
+        self.assertEqual(classify(HTTPStatusError(403)), "blocked")
+        self.assertEqual(classify(HTTPStatusError(403, {"cf-mitigated": "challenge"})), "challenge")
+        self.assertEqual(classify(HTTPStatusError(429)), "rate-limited")
+        self.assertEqual(classify(asyncio.TimeoutError()), "timeout")
+        self.assertEqual(classify(ChallengeError()), "challenge")
+        self.assertIsNone(classify(NotHTMLError("application/pdf")))
+
+    def test_repeated_failures_skip_host_and_persist(self):
+        health = DomainHealth()
+        for _ in range(3):
+            health.failure("https://bad.example/a", HTTPStatusError(403))
+        health.save()
+        verdict, reason, _ = DomainHealth().check("https://bad.example/other")
+        self.assertEqual((verdict, reason), ("skip", "blocked"))
+        self.assertEqual(DomainHealth().check("https://good.example/")[0], None)
+
+    def test_cooldown_turns_skip_into_demote(self):
+        health = DomainHealth()
+        for _ in range(2):
+            health.failure("https://slow.example/", asyncio.TimeoutError())
+        self.assertEqual(health.check("https://slow.example/")[0], "demote")
+        health.failure("https://slow.example/", asyncio.TimeoutError())
+        self.assertEqual(health.check("https://slow.example/")[0], "skip")
+        row = health._hosts["slow.example"]
+        row[2] = time.time() - domain_health.COOLDOWN - 1
+        self.assertEqual(health.check("https://slow.example/")[0], "demote")
+
+    def test_success_and_decay_clear_score(self):
+        health = DomainHealth()
+        health.failure("https://flaky.example/", HTTPStatusError(503))
+        health.failure("https://flaky.example/", HTTPStatusError(503))
+        self.assertEqual(health.check("https://flaky.example/")[0], "demote")
+        health.success("https://flaky.example/")
+        self.assertIsNone(health.check("https://flaky.example/")[0])
+        later = time.time() + 10 * domain_health.HALF_LIFE
+        with mock.patch.object(domain_health.time, "time", return_value=later):
+            health.save()
+        self.assertNotIn("flaky.example", DomainHealth()._hosts)
+
+    def test_concurrent_runs_add_up(self):
+        first, second = DomainHealth(), DomainHealth()
+        for _ in range(2):
+            first.failure("https://bad.example/", HTTPStatusError(403))
+        second.failure("https://bad.example/", HTTPStatusError(403))
+        second.failure("https://other.example/", HTTPStatusError(503))
+        first.save()
+        second.save()
+        # neither run overwrote the other's failures
+        verdict, reason, score = DomainHealth().check("https://bad.example/x")
+        self.assertEqual((verdict, reason), ("skip", "blocked"))
+        self.assertAlmostEqual(score, 3.0, places=2)
+        self.assertIn("other.example", DomainHealth()._hosts)
+
+        # a success elsewhere quarters the merged score instead of resetting it
+        third = DomainHealth()
+        third.success("https://bad.example/")
+        third.save()
+        self.assertAlmostEqual(DomainHealth().check("https://bad.example/")[2], 0.75, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,307 @@
+import pickle
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from deep_crawler.indexing import embed_cache, faiss_store
+from deep_crawler.indexing.mmap_store import MmapStore
+from deep_crawler.indexing.vector_store import VectorStore, enable_incremental_vacuum
+
+class TestEmbedCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.orig_path = embed_cache.DB_PATH
+        embed_cache.DB_PATH = Path(self.tmp.name) / "embeddings.sqlite"
+        self.requests = []
+
+        def fake_embed_many(texts, model=None):
+            self.requests.append(list(texts))
+            # a second model gives wider vectors
+            return [[float(len(t)), 1.0] + [2.0] * (model == "other") for t in texts]
+
+        patcher = mock.patch.object(embed_cache, "embed_many", fake_embed_many)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        embed_cache.get_store().close()
+        embed_cache._store = None
+        embed_cache.DB_PATH = self.orig_path
+        self.tmp.cleanup()
+
+    def test_misses_are_batched_and_cached(self):
+        texts = [f"text {i}" * (i + 1) for i in range(5)] + ["text 0"]
+        with mock.patch.object(embed_cache, "BATCH_SIZE", 2):
+            vecs = embed_cache.get_vectors(texts)
+        self.assertEqual([len(r) for r in self.requests], [2, 2, 1])
+        np.testing.assert_array_equal(vecs[0], vecs[-1])
+        self.assertEqual([v[0] for v in vecs], [float(len(t)) for t in texts])
+
+        self.requests.clear()
+        again = embed_cache.get_vectors(texts[::-1] + ["new"])
+        self.assertEqual(self.requests, [["new"]])
+        np.testing.assert_array_equal(again[:-1], vecs[::-1])
+
+        # committed rows read back the same as the pending ones did
+        embed_cache.get_store().flush()
+        self.requests.clear()
+        committed = embed_cache.get_vectors(texts)
+        self.assertEqual(self.requests, [])
+        np.testing.assert_array_equal(committed, vecs)
+        self.assertEqual(committed[0].dtype, np.float32)
+
+    def legacy_vecs(self, vec):
+        con = sqlite3.connect(embed_cache.DB_PATH)
+        con.execute("CREATE TABLE vecs (hash TEXT PRIMARY KEY, vec BLOB)")
+        con.execute("INSERT INTO vecs VALUES (?,?)",
+                    (embed_cache.text_hash("old"), pickle.dumps(vec)))
+        con.commit()
+        con.close()
+
+    def test_pickled_vecs_table_is_migrated(self):
+        self.legacy_vecs([0.5, 2.0])
+        self.assertEqual(embed_cache.get_store().migrated, 1)
+        # not trusted until a live embedding has the same dimension
+        self.assertEqual(embed_cache.get_store().models(), {})
+        embed_cache.get_vectors(["new"])
+        self.requests.clear()
+        vecs = embed_cache.get_vectors(["old"])
+        self.assertEqual(self.requests, [])
+        np.testing.assert_array_equal(vecs[0], [0.5, 2.0])
+        self.assertEqual(embed_cache.get_store().models(), {embed_cache.MODEL: 2})
+
+    def test_migrated_vectors_of_another_dimension_are_dropped(self):
+        self.legacy_vecs([0.5, 2.0, 1.0])   # from a wider model configured before
+        vecs = embed_cache.get_vectors(["old"])
+        self.assertEqual(self.requests, [["old"]])
+        np.testing.assert_array_equal(vecs[0], [3.0, 1.0])
+        store = embed_cache.get_store()
+        store.flush()
+        self.assertEqual(len(store), 1)
+
+    def test_vectors_are_keyed_by_model_and_reembedded(self):
+        texts = ["hot one", "hot two", "cold"]
+        embed_cache.get_vectors(texts)
+        store = embed_cache.get_store()
+        store.flush()
+        with mock.patch.object(embed_cache, "MODEL", "other"):
+            self.requests.clear()
+            self.assertEqual(len(embed_cache.get_vector("cold")), 3)
+            self.assertEqual(self.requests, [["cold"]])
+
+            self.requests.clear()
+            with mock.patch.object(embed_cache, "BATCH_SIZE", 1), \
+                    mock.patch.object(embed_cache, "CONCURRENCY", 1):
+                self.assertEqual(embed_cache.reembed(store, limit=3), 2)
+            self.assertEqual(sorted(self.requests), [["hot one"], ["hot two"]])
+            self.assertEqual(embed_cache.reembed(store, limit=3), 0)
+
+            self.requests.clear()
+            m = embed_cache.get_matrix(texts)
+            self.assertEqual((m.shape, self.requests), ((3, 3), []))
+        # the original model's vectors are untouched
+        self.assertEqual(len(embed_cache.get_vector("hot one")), 2)
+        self.assertEqual(store.models(), {embed_cache.MODEL: 2, "other": 3})
+
+    def test_stats_count_both_tiers(self):
+        with mock.patch.object(embed_cache, "L1", embed_cache.L1Cache(2**20)):
+            embed_cache.STATS.clear()
+            embed_cache.get_vectors(["a", "b"])
+            embed_cache.get_vectors(["a", "c"])
+            embed_cache.L1.clear()
+            self.requests.clear()
+            embed_cache.get_vector("b")
+            self.assertEqual(self.requests, [])
+            embed_cache.get_store().flush()
+            stats = embed_cache.stats()
+        self.assertEqual((stats["l1_hits"], stats["l1_misses"]), (1, 4))
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+        self.assertEqual(stats["hit_rate"], 0.4)
+        self.assertEqual(stats["entries"], 3)
+
+    def test_l1_keeps_recent_vectors_within_budget(self):
+        l1 = embed_cache.L1Cache(16)    # two 2-d float32 vectors
+        l1.put_many("m", {"a": [1, 2], "b": [3, 4]})
+        l1.get_many("m", ["a"])
+        l1.put_many("m", {"c": [5, 6]})
+        self.assertEqual(sorted(l1.get_many("m", ["a", "b", "c"])), ["a", "c"])
+        self.assertEqual((len(l1), l1.bytes), (2, 16))
+        self.assertEqual(l1.get_many("other", ["a"]), {})
+        vec = l1.get_many("m", ["a"])["a"]
+        self.assertEqual(vec.dtype, np.float32)
+        self.assertFalse(vec.flags.writeable)
+
+    def test_mmap_backend_returns_views(self):
+        with mock.patch.object(embed_cache, "BACKEND", "mmap"):
+            texts = ["alpha", "beta", "gamma"]
+            m = embed_cache.get_matrix(texts)
+            store = embed_cache.get_store()
+            self.assertIsInstance(store, MmapStore)
+            self.assertEqual(m.shape, (3, 2))
+            self.assertFalse(m.flags.writeable)
+            segment = store._segment((embed_cache.MODEL, 2))
+            self.assertTrue(np.shares_memory(m, segment._mapped))
+            np.testing.assert_array_equal(m[:, 0], [5.0, 4.0, 5.0])
+
+            self.requests.clear()
+            shuffled = embed_cache.get_matrix(["gamma", "alpha"])
+            self.assertEqual(self.requests, [])
+            np.testing.assert_array_equal(shuffled, m[[2, 0]])
+            np.testing.assert_array_equal(embed_cache.get_vectors(["beta"])[0], m[1])
+
+            # faiss normalizes a chunk at a time into its own buffer
+            with mock.patch.object(faiss_store, "CHUNK", 2):
+                index = faiss_store.build(texts)
+            np.testing.assert_allclose(
+                index.reconstruct_n(0, 3), m / np.linalg.norm(m, axis=1, keepdims=True), rtol=1e-6)
+            np.testing.assert_array_equal(m[:, 0], [5.0, 4.0, 5.0])
+
+class TestVectorStore(unittest.TestCase):
+
+    def test_float16_round_trip_and_wal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(Path(tmp) / "v.sqlite", dtype="float16")
+            try:
+                ns = ("m", 3)
+                pending = store.put_many(ns, [("a", [0.1, 0.2, 0.3])])["a"]
+                store.flush()
+                stored = store.get(ns, "a")
+                self.assertIsNone(store.get(("m", 4), "a"))
+                np.testing.assert_array_equal(pending, stored)
+                np.testing.assert_allclose(stored, [0.1, 0.2, 0.3], rtol=1e-3)
+                self.assertEqual(len(store), 1)
+                mode = store.connection().execute("PRAGMA journal_mode").fetchone()[0]
+                self.assertEqual(mode, "wal")
+            finally:
+                store.close()
+
+    def test_least_recently_used_vectors_are_evicted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "v.sqlite"
+            con = sqlite3.connect(path)     # an old database without incremental vacuum
+            con.execute("CREATE TABLE scratch (x)")
+            con.commit()
+            con.close()
+
+            self.assertTrue(enable_incremental_vacuum(path))
+            self.assertFalse(enable_incremental_vacuum(path))
+            store = VectorStore(path, max_entries=10, maintain_interval=0)
+            try:
+                ns = ("m", 2)
+                hashes = [f"{i:02d}" for i in range(10)]
+                store.put_many(ns, [(h, [1.0, 2.0]) for h in hashes])
+                store.put_texts([(h, f"text {h}") for h in hashes])
+                store.flush()
+                store.get_many(ns, hashes[:3])      # the three oldest are used again
+                store.flush()
+                store.put_many(ns, [("new", [3.0, 4.0])])
+                store.flush()
+
+                self.assertEqual(store.evicted, 2)
+                self.assertEqual(store.missing(ns, hashes + ["new"]), hashes[3:5])
+                self.assertEqual(sorted(store.texts(hashes)), hashes[:3] + hashes[5:])
+                stats = store.stats()
+                self.assertEqual((stats["entries"], stats["evicted"]), (9, 2))
+                mode = store.connection().execute("PRAGMA auto_vacuum").fetchone()[0]
+                self.assertEqual(mode, 2)
+            finally:
+                store.close()
+
+    def test_stats_and_flush_with_a_dead_writer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(Path(tmp) / "v.sqlite")
+            try:
+                ns = ("m", 2)
+                store.put_many(ns, [("a", [1.0, 2.0])])
+                store.flush()
+                store._queue.put(None)      # the writer stops
+                store._writer.join()
+                store.put_many(ns, [("b", [3.0, 4.0])])
+                # committed rows only, without waiting on the queue
+                self.assertEqual(store.stats()["entries"], 1)
+                with self.assertRaises(RuntimeError):
+                    store.flush()
+            finally:
+                store.close()
+
+class TestMmapStore(unittest.TestCase):
+
+    def test_appends_are_shared_and_persist(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "v.sqlite"
+            ns = ("some/model:v1", 2)
+            a, b = MmapStore(path), MmapStore(path)
+            a.put_many(ns, [("aa" * 32, [1.0, 2.0]), ("bb" * 32, [3.0, 4.0])])
+            # b picks up rows another writer appended, then appends after them
+            np.testing.assert_array_equal(b.get(ns, "bb" * 32), [3.0, 4.0])
+            b.put_many(ns, [("cc" * 32, [5.0, 6.0])])
+            self.assertEqual(a.missing(ns, ["aa" * 32, "cc" * 32, "dd" * 32]), ["dd" * 32])
+            self.assertEqual(a.missing(("other", 2), ["aa" * 32]), ["aa" * 32])
+            with self.assertRaises(ValueError):
+                a.put_many(ns, [("dd" * 32, [1.0])])
+
+            reopened = MmapStore(path)
+            self.assertEqual(len(reopened), 3)
+            np.testing.assert_array_equal(
+                reopened.matrix(ns, ["aa" * 32, "bb" * 32, "cc" * 32]),
+                [[1, 2], [3, 4], [5, 6]])
+            for store in (a, b, reopened):
+                store.close()
+
+    def test_legacy_segment_waits_for_a_matching_embedding(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "v.sqlite"
+            old = MmapStore(path)
+            old.put_many(("unkeyed", 3), [("aa" * 32, [1.0, 2.0, 3.0])])
+            old.close()
+            for p in old._files(("unkeyed", 3)):
+                p.rename(path.with_suffix(p.suffix))
+
+            store = MmapStore(path, legacy_model="m")
+            try:
+                self.assertEqual((store.migrated, store.dim("m")), (1, None))
+                store.put_many(("m", 2), [("bb" * 32, [1.0, 2.0])])
+                self.assertEqual([p.exists() for p in store._files(("m", 3))], [False, False])
+                self.assertEqual(store.missing(("m", 2), ["aa" * 32, "bb" * 32]), ["aa" * 32])
+            finally:
+                store.close()
+
+    def test_lookups_create_no_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MmapStore(Path(tmp) / "v.sqlite")
+            try:
+                ns = ("m", 2)
+                self.assertEqual(store.missing(ns, ["aa" * 32]), ["aa" * 32])
+                self.assertIsNone(store.matrix(ns, ["aa" * 32]))
+                self.assertEqual(len(store), 0)
+                self.assertEqual([p for p in store._files(ns) if p.exists()], [])
+                store.put_many(ns, [("aa" * 32, [1.0, 2.0])])
+                self.assertTrue(all(p.exists() for p in store._files(ns)))
+            finally:
+                store.close()
+
+    def test_least_recently_used_texts_are_dropped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MmapStore(Path(tmp) / "v.sqlite", max_entries=10, maintain_interval=0)
+            try:
+                ns = ("m", 2)
+                hashes = [f"{i:02d}" * 32 for i in range(10)]
+                store.put_many(ns, [(h, [1.0, 2.0]) for h in hashes])
+                store.put_texts([(h, f"text {h}") for h in hashes])
+                store.flush()
+                store.get_many(ns, hashes[:3])      # the three oldest are used again
+                store.flush()
+                store.put_texts([("new" * 16, "new text")])
+                store.flush()
+
+                self.assertEqual(sorted(store.texts(hashes)), hashes[:3] + hashes[5:])
+                # the rows themselves stay
+                self.assertEqual(store.missing(ns, hashes), [])
+            finally:
+                store.close()
+
+if __name__ == '__main__':
+    unittest.main()
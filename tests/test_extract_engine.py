@@ -0,0 +1,83 @@
+import unittest
+from deep_crawler.crawler import extract_engine
+from deep_crawler.crawler.extractor import BodyCollector, NotHTMLError, check_content_type
+
+ARTICLE = """<html><head><title>Fast Path</title></head><body>
+<nav><a href="/">Home</a> <a href="/about">About</a></nav>
+<article>
+""" + "<p>Vector search compares embeddings, and ranking keeps the closest ones.</p>\n" * 20 + """
+</article>
+<footer>Copyright</footer>
+</body></html>"""
+
+class TestExtractEngine(unittest.TestCase):
+
+    def test_fast_path_keeps_article_text(self):
+        page = extract_engine.fast_extract(ARTICLE, "http://example.com/a")
+        self.assertIsNotNone(page)
+        self.assertEqual(page["title"], "Fast Path")
+        self.assertIn("Vector search", page["markdown"])
+        self.assertNotIn("Copyright", page["markdown"])
+        self.assertNotIn("About", page["markdown"])
+
+    def test_fast_path_declines_thin_pages(self):
+        html = "<html><head><title>x</title></head><body><p>Too short.</p></body></html>"
+        self.assertIsNone(extract_engine.fast_extract(html, "http://example.com/b"))
+
+    def test_declared_charset_is_not_applied_twice(self):
+        latin = ARTICLE.replace("<head>", '<head><meta charset="iso-8859-1">')
+        latin = latin.replace("Vector search", "Café naïve search")
+        body = BodyCollector()
+        body.feed(latin.encode("latin-1"))
+        page = extract_engine.fast_extract(body.html("text/html"), "http://example.com/l")
+        self.assertIn("Café naïve search", page["markdown"])
+
+    def test_extract_falls_back_to_readability(self):
+        html = "<html><head><title>Thin</title></head><body><div>Only a line</div></body></html>"
+        page = extract_engine.extract(html, "http://example.com/c")
+        self.assertEqual(page["url"], "http://example.com/c")
+        self.assertTrue(page["markdown"].startswith("# "))
+
+    def test_engine_runs_in_process_pool(self):
+        engine = extract_engine.ExtractionEngine(workers=1)
+        try:
+            page = engine.extract(ARTICLE, "http://example.com/d")
+        finally:
+            engine.shutdown()
+        self.assertEqual(page["title"], "Fast Path")
+
+class TestBodyCollector(unittest.TestCase):
+
+    def test_rejects_non_html(self):
+        with self.assertRaises(NotHTMLError):
+            check_content_type("application/pdf")
+        check_content_type("text/html; charset=utf-8")
+        with self.assertRaises(NotHTMLError):
+            BodyCollector().feed(b"%PDF-1.7 binary")
+
+    def test_stops_at_byte_cap(self):
+        body = BodyCollector(max_bytes=1000, text_budget=10**9)
+        self.assertFalse(body.feed(b"<html><body>" + b"<div>x</div>" * 200))
+        self.assertEqual(body.size, 1000)
+
+    def test_stops_once_enough_text_is_parsed(self):
+        body = BodyCollector(max_bytes=10**9, text_budget=500)
+        chunk = ("<p>" + "words " * 20 + "</p>").encode()
+        fed = 1
+        self.assertTrue(body.feed(b"<html><body>" + chunk))
+        while body.feed(chunk):
+            fed += 1
+        self.assertLess(fed, 10)
+        self.assertIn("words", body.html("text/html; charset=utf-8"))
+
+    def test_unknown_charset_falls_back_to_utf8(self):
+        body = BodyCollector()
+        body.feed('<html><head><meta charset="x-mac-bogus"></head><p>café</p>'.encode())
+        self.assertIn("café", body.html("text/html; charset=x-mac-bogus"))
+        self.assertIn("café", body.html())
+        latin = BodyCollector()
+        latin.feed("<html><p>café</p>".encode("latin-1"))
+        self.assertIn("café", latin.html("text/html; charset=ISO-8859-1"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from aiohttp import web
+from fc_mock import CrawlerTestCase, MockFirecrawl
+from deep_crawler.crawler import firecrawl_async
+
+ARTICLE = "<html><head><title>Static</title></head><body><article>" + (
+    "<p>Static fallback text that is long enough for the fast path, really.</p>" * 20
+) + "</article></body></html>"
+
+class MockBatch(MockFirecrawl):
+    """Batch-scrape API that pages its results and drops one URL."""
+
+    def routes(self, app):
+        app.router.add_post("/v1/batch/scrape", self.submit)
+        app.router.add_get("/v1/batch/scrape/{jid}", self.batch_status)
+        app.router.add_get("/v1/batch/scrape/{jid}/page2", self.page2)
+        app.router.add_get("/static/{name}", self.static)
+
+    def _item(self, url):
+        # sourceURL comes back re-spelled; demultiplexing must canonicalize it
+        return {"markdown": f"# {url}",
+                "metadata": {"title": url, "sourceURL": url + "?utm_source=fc"}}
+
+    def _found(self, jid):
+        return [u for u in self.submits[int(jid[3:]) - 1]["urls"] if "missing" not in u]
+
+    async def batch_status(self, request):
+        self.polls += 1
+        jid = request.match_info["jid"]
+        urls = self._found(jid)
+        return web.json_response({
+            "status": "completed",
+            "data": [self._item(u) for u in urls[:1]],
+            "next": f"{self.base}/v1/batch/scrape/{jid}/page2" if len(urls) > 1 else None,
+        })
+
+    async def page2(self, request):
+        urls = self._found(request.match_info["jid"])
+        return web.json_response({"data": [self._item(u) for u in urls[1:]]})
+
+    async def static(self, request):
+        return web.Response(text=ARTICLE, content_type="text/html")
+
+class TestFirecrawlBatch(CrawlerTestCase):
+    settings = {"BATCH_SIZE": 3, "BATCH_LINGER": 0.05}
+    cache_settings = {"ENABLED": False}
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.serve(MockBatch())
+
+    async def test_batches_and_demultiplexes_results(self):
+        urls = [f"{self.mock.base}/doc/{i}" for i in range(5)]
+        pages = await firecrawl_async.crawl_urls(urls)
+        self.assertEqual(sorted(p["url"] for p in pages), sorted(urls))
+        self.assertEqual([len(b["urls"]) for b in self.mock.submits], [3, 2])
+        for p in pages:
+            self.assertEqual(p["markdown"], f"# {p['url']}")
+
+    async def test_missing_urls_fall_back_to_static_fetch(self):
+        urls = [f"{self.mock.base}/doc/a", f"{self.mock.base}/static/missing"]
+        pages = {p["url"]: p for p in await firecrawl_async.crawl_urls(urls)}
+        self.assertEqual(len(self.mock.submits), 1)
+        self.assertEqual(pages[urls[1]]["title"], "Static")
+        self.assertEqual(pages[urls[0]]["markdown"], f"# {urls[0]}")
+
+if __name__ == '__main__':
+    unittest.main()
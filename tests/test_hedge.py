@@ -0,0 +1,96 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+import aiohttp
+from fc_mock import CrawlerTestCase, MockFirecrawl
+from deep_crawler.crawler import firecrawl_async
+
+STATIC = [{"url": "http://site/", "title": "Static", "markdown": "# one static page"}]
+
+def page(i):
+    return {"url": f"http://site/{i}", "title": str(i), "markdown": f"# page {i}"}
+
+class MockCrawl(MockFirecrawl):
+    """One page while the job runs, three once it's done."""
+
+    def partial(self, jid):
+        return [page(0)]
+
+    def result(self, jid):
+        return [page(i) for i in range(3)]
+
+class TestHedge(CrawlerTestCase):
+    settings = {"HEDGE": True, "HEDGE_DELAY": 0.05, "HEDGE_GRACE": 0.5,
+                "POLL_INITIAL": 0.02, "POLL_MAX": 0.05}
+    cache_settings = {"CRAWLS_ENABLED": False}
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.static_calls = []
+        self.static_cancelled = []
+
+    def static(self, delay):
+        async def fake(session, url):
+            self.static_calls.append(url)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.static_cancelled.append(url)
+                raise
+            return STATIC
+        return mock.patch.object(firecrawl_async, "_static_extract", fake)
+
+    async def handle(self):
+        async with aiohttp.ClientSession() as s:
+            pages = await firecrawl_async._handle_one(s, "http://site/", 15)
+            # a cancelled job's DELETE goes out in the background, as in crawl_stream
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(t for t in firecrawl_async._background if t.get_loop() is loop))
+        return pages
+
+    async def test_crawl_finishing_within_the_grace_period_wins(self):
+        await self.serve(MockCrawl(0.3))
+        with self.static(0):
+            pages = await self.handle()
+        self.assertEqual(len(self.static_calls), 1)
+        self.assertEqual(pages, [page(i) for i in range(3)])
+
+    async def test_static_page_wins_over_a_hung_crawl(self):
+        await self.serve(MockCrawl(30))
+        self.patch(firecrawl_async, HEDGE_GRACE=0.1)
+        with self.static(0):
+            start = time.monotonic()
+            pages = await self.handle()
+        self.assertEqual(pages, STATIC)
+        # hedge_delay + hedge_grace, not job_timeout
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.mock.deleted, ["job1"])
+
+    async def test_static_page_is_used_once_firecrawl_fails(self):
+        await self.serve(MockCrawl(0.2, "failed"))
+        with self.static(0):
+            start = time.monotonic()
+            pages = await self.handle()
+        self.assertEqual(pages, STATIC)
+        # already fetched while Firecrawl was still running
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    async def test_losing_static_fetch_is_cancelled(self):
+        await self.serve(MockCrawl(0.1))
+        with self.static(5):
+            start = time.monotonic()
+            pages = await self.handle()
+        self.assertEqual(len(pages), 3)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.static_cancelled, ["http://site/"])
+
+    async def test_no_hedge_before_the_delay(self):
+        await self.serve(MockCrawl(0))
+        with self.static(0):
+            pages = await self.handle()
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(self.static_calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+from deep_crawler import keywords
+
+# toy embedding: synonyms share an axis
+AXES = [("latency", "delay", "lag"), ("price", "cost")]
+
+def fake_embed_many(texts):
+    return [[float(any(w in t.lower() for w in axis)) + 0.01 for axis in AXES]
+            for t in texts]
+
+class TestKeywordClustering(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(keywords, "embed_many", fake_embed_many)
+        self.embed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_near_synonyms_share_a_query_and_budget(self):
+        kws = ["network latency", "Network  Latency", "network delay", "cloud cost",
+               "cloud price"]
+        queries, budgets, clusters = keywords.allocate(kws, 6, threshold=0.95)
+        self.assertEqual(queries, ["network latency", "cloud cost"])
+        self.assertEqual(budgets, [18, 12])
+        self.assertEqual(clusters[0], ["network latency", "Network  Latency", "network delay"])
+
+    def test_distinct_keywords_are_kept(self):
+        queries, budgets, _ = keywords.allocate(["latency", "cost"], 6, threshold=0.95)
+        self.assertEqual(queries, ["latency", "cost"])
+        self.assertEqual(budgets, [6, 6])
+
+    def test_threshold_zero_only_merges_spelling_variants(self):
+        clusters = keywords.cluster(["Lag", "lag", "delay"], threshold=0)
+        self.assertEqual(clusters, [["Lag", "lag"], ["delay"]])
+
+    def test_keywords_covered_by_searched_queries_are_dropped(self):
+        queries, budgets, _ = keywords.allocate(
+            ["network delay", "cloud cost"], 6, threshold=0.95, searched=["latency"])
+        self.assertEqual((queries, budgets), (["cloud cost"], [6]))
+
+    def test_extract_keyphrases(self):
+        phrases = keywords.extract(
+            "What are the health effects of intermittent fasting on older adults?", 2)
+        self.assertEqual(phrases, ["health effects", "intermittent fasting"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import aiohttp
+from fc_mock import CrawlerTestCase, MockFirecrawl
+from deep_crawler.crawler import firecrawl_async, page_cache
+from deep_crawler.crawler.novelty import NoveltyTracker
+
+FRESH = " ".join(f"word{i}" for i in range(200))
+REPEAT = "the same boilerplate paragraph shows up on every page of this site " * 10
+
+def page(i, text):
+    return {"url": f"http://site/{i}", "title": str(i), "markdown": text}
+
+class MockCrawl(MockFirecrawl):
+    """A crawl job that keeps finding pages with nothing new on them."""
+
+    def partial(self, jid):
+        return [page(0, FRESH)] + [page(i, REPEAT) for i in range(1, 2 * self.polls)]
+
+class TestNovelty(unittest.TestCase):
+
+    def test_repeated_text_has_no_novelty(self):
+        tracker = NoveltyTracker()
+        self.assertEqual(tracker.novelty(FRESH), 1.0)
+        self.assertEqual(tracker.novelty(FRESH), 0.0)
+
+    def test_seed_stops_when_window_goes_stale(self):
+        tracker = NoveltyTracker(threshold=0.2, window=3)
+        seed = tracker.seed()
+        pages = [page(0, FRESH), page(1, REPEAT)]
+        self.assertFalse(seed.feed(pages))
+        # the first copy of the boilerplate was new; three stale pages later it stops
+        pages += [page(i, REPEAT) for i in range(2, 5)]
+        self.assertTrue(seed.feed(pages))
+        self.assertEqual(len(seed.scores), 5)
+
+class TestAdaptiveDepth(CrawlerTestCase):
+    settings = {"POLL_INITIAL": 0.01}
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.serve(MockCrawl())
+
+    async def test_stale_seed_is_cancelled(self):
+        tracker = NoveltyTracker(threshold=0.2, window=3)
+        async with aiohttp.ClientSession() as s:
+            pages = await firecrawl_async._firecrawl(s, "http://site/", 15, novelty=tracker.seed())
+            while firecrawl_async._background:
+                await next(iter(firecrawl_async._background))
+        self.assertLess(len(pages), 15)
+        self.assertEqual(self.mock.deleted, ["job1"])
+        self.assertEqual(tracker.stopped, 1)
+
+    async def test_stopped_crawl_is_not_cached(self):
+        self.patch(page_cache, CRAWLS_ENABLED=True)
+        self.patch(firecrawl_async, HEDGE=False)
+        async with aiohttp.ClientSession() as s:
+            pages = await firecrawl_async._handle_one(
+                s, "http://site/", 15, novelty=NoveltyTracker(threshold=0.2, window=3))
+        self.assertLess(len(pages), 15)
+        self.assertIsNone(page_cache.lookup_crawl("http://site/", 15))
+
+if __name__ == '__main__':
+    unittest.main()
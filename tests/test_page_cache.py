@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+import aiohttp
+from aiohttp import web
+from deep_crawler.crawler import extractor, firecrawl_async, page_cache
+from deep_crawler.crawler.urls import canonical_url
+
+class TestPageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.orig_path = page_cache.DB_PATH
+        page_cache.DB_PATH = Path(self.tmp.name) / "pages.sqlite"
+        page_cache._local = threading.local()
+
+    def tearDown(self):
+        page_cache.get_connection().close()
+        page_cache._local = threading.local()
+        page_cache.DB_PATH = self.orig_path
+        self.tmp.cleanup()
+
+    def test_canonical_url_drops_noise(self):
+        self.assertEqual(
+            canonical_url("HTTPS://Example.com:443/a?b=2&utm_source=x&a=1#frag"),
+            "https://example.com/a?a=1&b=2",
+        )
+
+    def test_store_and_lookup_by_canonical_url(self):
+        page = {"url": "https://example.com/a", "title": "A", "markdown": "# A"}
+        page_cache.store("https://example.com/a", "<html></html>", page,
+                         {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        entry = page_cache.lookup("https://EXAMPLE.com/a?utm_medium=email")
+        self.assertTrue(entry["fresh"])
+        self.assertEqual(entry["page"], page)
+        self.assertEqual(page_cache.validators(entry), {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        })
+        self.assertEqual(page_cache.raw_html("https://example.com/a"), "<html></html>")
+
+    def test_expired_entry_is_stale_until_touched(self):
+        page_cache.store("https://example.com/b", "<html></html>", {"url": "b"})
+        page_cache.get_connection().execute("UPDATE pages SET fetched_at = 0")
+        self.assertFalse(page_cache.lookup("https://example.com/b")["fresh"])
+        page_cache.touch("https://example.com/b")
+        self.assertTrue(page_cache.lookup("https://example.com/b")["fresh"])
+
+    def test_missing_entry(self):
+        self.assertIsNone(page_cache.lookup("https://example.com/missing"))
+        self.assertEqual(page_cache.validators(None), {})
+
+    def test_crawl_results_keyed_by_seed_and_limit(self):
+        pages = [{"url": "https://example.com/", "title": "Home", "markdown": "# Home"}]
+        page_cache.store_crawl("https://example.com/?utm_source=x", 15, pages)
+        entry = page_cache.lookup_crawl("https://EXAMPLE.com/", 15)
+        self.assertTrue(entry["fresh"])
+        self.assertEqual(entry["pages"], pages)
+        self.assertIsNone(page_cache.lookup_crawl("https://example.com/", 5))
+        page_cache.get_connection().execute("UPDATE crawls SET fetched_at = 0")
+        self.assertFalse(page_cache.lookup_crawl("https://example.com/", 15)["fresh"])
+
+class TestStaticRevalidation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.orig_path = page_cache.DB_PATH
+        page_cache.DB_PATH = Path(self.tmp.name) / "pages.sqlite"
+        page_cache._local = threading.local()
+        self.requests = []
+        app = web.Application()
+        app.router.add_get("/page", self.page)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/page"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        page_cache._local = threading.local()
+        page_cache.DB_PATH = self.orig_path
+        self.tmp.cleanup()
+
+    async def page(self, request):
+        # a confused intermediary: 304 to anything that doesn't insist
+        self.requests.append(dict(request.headers))
+        if request.headers.get("Cache-Control") != "no-cache":
+            return web.Response(status=304)
+        return web.Response(text="<html><head><title>Fresh</title></head><body>"
+                                 "<p>Body text.</p></body></html>", content_type="text/html")
+
+    async def test_304_without_cache_entry_is_refetched(self):
+        async with aiohttp.ClientSession() as s:
+            pages = await firecrawl_async._static_extract(s, self.url)
+        self.assertEqual(pages[0]["title"], "Fresh")
+        self.assertEqual(len(self.requests), 2)
+        self.assertNotIn("If-None-Match", self.requests[1])
+
+    async def test_sync_304_without_cache_entry_is_refetched(self):
+        loop = asyncio.get_running_loop()
+        page = await loop.run_in_executor(None, extractor.simple_extract, self.url)
+        self.assertEqual(page["title"], "Fresh")
+        self.assertEqual(len(self.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+from deep_crawler.indexing import prerank
+
+# toy embedding: one axis per topic word
+TOPICS = ["latency", "cost", "security"]
+
+def fake_embed_many(texts):
+    return [[float(t.lower().count(w)) + 0.01 for w in TOPICS] for t in texts]
+
+def hit(i, text):
+    return {"url": f"http://example.com/{i}", "title": text, "content": ""}
+
+class TestPrerank(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(prerank, "embed_many", fake_embed_many)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_picks_hits_covering_every_section(self):
+        hits = [hit(0, "latency latency"), hit(1, "latency again"), hit(2, "latency tips"),
+                hit(3, "cost breakdown"), hit(4, "security review")]
+        chosen = prerank.select(hits, ["Latency", "Cost", "Security"], 3)
+        # one latency hit is enough; the other two picks go to the uncovered sections
+        self.assertEqual(sum("latency" in h["title"] for h in chosen), 1)
+        self.assertEqual({h["url"] for h in chosen} & {hits[3]["url"], hits[4]["url"]},
+                         {hits[3]["url"], hits[4]["url"]})
+
+    def test_trivial_cases_skip_embedding(self):
+        hits = [hit(0, "cost"), hit(1, "security")]
+        self.assertEqual(prerank.select(hits, ["Cost"], 5), hits)
+        self.assertEqual(prerank.select(hits, [], 1), hits[:1])
+
+if __name__ == '__main__':
+    unittest.main()
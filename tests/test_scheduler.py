@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from deep_crawler.crawler.scheduler import HostScheduler, PrioritySemaphore, TokenBucket
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+
+    async def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.03)
+        for _ in range(2):
+            await bucket.acquire()
+        # two more tokens at 20/sec
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+class TestPrioritySemaphore(unittest.IsolatedAsyncioTestCase):
+
+    async def test_highest_priority_first_fifo_on_ties(self):
+        sem = PrioritySemaphore(1)
+        await sem.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            async with sem.hold(priority):
+                order.append(name)
+
+        tasks = [asyncio.create_task(waiter(n, p))
+                 for n, p in [("low", 1), ("high", 5), ("mid", 3), ("high2", 5)]]
+        await asyncio.sleep(0)
+        sem.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["high", "high2", "mid", "low"])
+        self.assertEqual(sem._value, 1)
+
+    async def test_cancelled_waiters_give_up_their_place(self):
+        sem = PrioritySemaphore(1)
+        await sem.acquire()
+        queued = asyncio.create_task(sem.acquire(10))
+        other = asyncio.create_task(sem.acquire(1))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.sleep(0)
+        sem.release()
+        await asyncio.wait_for(other, 1)
+        # woken and cancelled in the same tick: the slot passes on
+        woken = asyncio.create_task(sem.acquire(5))
+        await asyncio.sleep(0)
+        sem.release()
+        woken.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await woken
+        self.assertEqual(sem._value, 1)
+        self.assertEqual(sem._waiters, [])
+
+class TestHostScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_per_host_cap_does_not_block_other_hosts(self):
+        scheduler = HostScheduler(concurrency=3, per_host=1, rate=1000, burst=10)
+        running, peak, order = {}, {}, []
+
+        async def fetch(url, host):
+            async with scheduler.slot(url):
+                running[host] = running.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), running[host])
+                order.append(url)
+                await asyncio.sleep(0.02)
+                running[host] -= 1
+
+        urls = [(f"https://a.example/{i}", "a") for i in range(3)] + [("https://b.example/", "b")]
+        await asyncio.gather(*(fetch(u, h) for u, h in urls))
+        self.assertEqual(peak, {"a": 1, "b": 1})
+        # b queued behind a's burst but got in alongside a's first URL
+        self.assertEqual(order[:2], ["https://a.example/0", "https://b.example/"])
+
+    async def test_global_cap(self):
+        scheduler = HostScheduler(concurrency=2, per_host=5, rate=1000, burst=10)
+        running, peak = [0], [0]
+
+        async def fetch(url):
+            async with scheduler.slot(url):
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.01)
+                running[0] -= 1
+
+        await asyncio.gather(*(fetch(f"https://h{i}.example/") for i in range(6)))
+        self.assertEqual(peak[0], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from aiohttp import web
+from deep_crawler import search
+
+class MockSearx:
+    """SearX JSON API that takes a while to answer each query."""
+
+    def __init__(self):
+        self.queries = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        q = request.query["q"]
+        if q == "broken":
+            return web.Response(status=500)
+        self.queries.append((q, request.query["language"]))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        return web.json_response({"results": [
+            {"url": f"http://{q}.example/{i}", "title": f"{q} {i}", "content": "snippet"}
+            for i in range(5)
+        ]})
+
+class TestSearch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (search.DB_PATH, search.SEARX_URL)
+        search.DB_PATH = Path(self.tmp.name) / "search.sqlite"
+        search._local = threading.local()
+        self.mock = MockSearx()
+        app = web.Application()
+        app.router.add_get("/search", self.mock.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/search"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        search.get_connection().close()
+        search._local = threading.local()
+        search.DB_PATH, search.SEARX_URL = self.saved
+        self.tmp.cleanup()
+
+    async def _all(self, queries, n, **kwargs):
+        return {q: hits async for _, q, hits in
+                search.search_many(queries, n, url=self.url, **kwargs)}
+
+    async def test_queries_run_concurrently_and_keep_snippets(self):
+        found = await self._all(["a", "b", "c", "broken"], 3)
+        self.assertGreater(self.mock.peak, 1)
+        self.assertEqual(found["broken"], [])
+        self.assertEqual([h["url"] for h in found["a"]],
+                         [f"http://a.example/{i}" for i in range(3)])
+        self.assertEqual(found["a"][0]["content"], "snippet")
+
+    async def test_cache_is_keyed_by_query_and_language(self):
+        await self._all(["a"], 3)
+        found = await self._all(["a"], 5)
+        self.assertEqual(len(found["a"]), 5)
+        await self._all(["a"], 3, language="de")
+        self.assertEqual(self.mock.queries, [("a", "en"), ("a", "de")])
+
+    async def test_cache_is_keyed_by_endpoint(self):
+        await self._all(["a"], 3)
+        # same instance, spelled differently: a separate cache entry
+        other = self.url.replace("127.0.0.1", "localhost")
+        found = {q: hits async for _, q, hits in search.search_many(["a"], 3, url=other)}
+        self.assertEqual(len(found["a"]), 3)
+        self.assertEqual(self.mock.queries, [("a", "en"), ("a", "en")])
+
+if __name__ == '__main__':
+    unittest.main()
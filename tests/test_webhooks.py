@@ -0,0 +1,68 @@
+import time
+import unittest
+from unittest import mock
+import aiohttp
+from fc_mock import CrawlerTestCase, MockFirecrawl
+from deep_crawler.crawler import firecrawl_async, webhooks
+
+class TestWebhooks(CrawlerTestCase):
+    settings = {"POLL_INITIAL": 0.02, "POLL_MAX": 1.0, "WEBHOOK_POLL_MAX": 2.0}
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.serve(MockFirecrawl(duration=0.3))
+        self.listener = webhooks.WebhookListener(host="127.0.0.1", port=0, url="")
+        await self.listener.start()
+        self.addAsyncCleanup(self.listener.stop)
+
+    async def crawl(self, hooks):
+        self.mock.polls = 0
+        start = time.monotonic()
+        async with aiohttp.ClientSession() as s:
+            pages = await firecrawl_async._firecrawl(s, "http://site/", 5, hooks=hooks)
+        self.assertEqual(pages[0]["markdown"], "# http://site/")
+        return self.mock.polls, time.monotonic() - start
+
+    async def test_callback_wakes_the_poller(self):
+        polls, elapsed = await self.crawl(self.listener)
+        # one poll before the callback, one after it
+        self.assertEqual(polls, 2)
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual(self.listener._waiters, {})
+
+    async def test_polling_backs_off(self):
+        polls, elapsed = await self.crawl(None)
+        # 0.02s doubling with jitter: a handful of polls, not one every 20ms
+        self.assertGreaterEqual(polls, 3)
+        self.assertLessEqual(polls, 8)
+        self.assertLess(elapsed, 1.5)
+
+    async def test_unknown_job_ids_do_not_pile_up(self):
+        async with aiohttp.ClientSession() as s:
+            await s.post(self.listener.url, json={"type": "crawl.completed", "id": "early"})
+            # a callback that beat expect() still resolves it
+            self.assertEqual(self.listener.expect("early").result(), "crawl.completed")
+            self.listener.forget("early")
+            with mock.patch.object(webhooks, "EARLY_MAX", 3):
+                for i in range(10):
+                    await s.post(self.listener.url, json={"type": "crawl.failed", "id": f"x{i}"})
+            self.assertEqual(list(self.listener._early), ["x7", "x8", "x9"])
+            with mock.patch.object(webhooks, "EARLY_TTL", 0):
+                await s.post(self.listener.url, json={"type": "crawl.failed", "id": "y"})
+        self.assertEqual(self.listener._early, {})
+        self.assertEqual(self.listener._waiters, {})
+
+    def test_callback_url_follows_the_listen_address(self):
+        self.assertRegex(self.listener.url, r"^http://127\.0\.0\.1:\d+/firecrawl$")
+        self.assertEqual(webhooks.callback_url("10.0.0.5", 3003), "http://10.0.0.5:3003/firecrawl")
+        self.assertEqual(webhooks.callback_url("::1", 3003), "http://[::1]:3003/firecrawl")
+        with self.assertRaises(ValueError):
+            webhooks.callback_url("0.0.0.0", 3003)
+
+    async def test_wildcard_host_needs_an_explicit_url(self):
+        with mock.patch.multiple(webhooks, PORT=1, HOST="0.0.0.0", PUBLIC_URL=""):
+            async with webhooks.listening() as hooks:
+                self.assertIsNone(hooks)
+
+if __name__ == '__main__':
+    unittest.main()